@@ -0,0 +1,94 @@
+#!/usr/bin/python3
+## Runs many E20 programs in one invocation, spread over a pool of worker processes
+
+import argparse
+import contextlib
+import glob
+import io
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from sim_main import *
+from simcache import *
+
+def find_programs(patterns):
+    """
+    Expands directories (searched recursively for .bin files) and glob patterns
+    into a sorted list of program files without duplicates
+    sig: list(str) -> list(str)
+    """
+    found = set()
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            found.update(glob.glob(os.path.join(pattern,"**","*.bin"),recursive=True))
+        else:
+            found.update(path for path in glob.glob(pattern,recursive=True) if os.path.isfile(path))
+    return sorted(found)
+
+def run_program(filename,cache_configs,blocks,max_steps,use_image=True):
+    """
+    Simulates one program, first without caches and then once per cache configuration.
+    Returns a result dict with the final state as printed by print_state and
+    the cache log of every configuration, or the error that stopped the program.
+    use_image is passed on to load_program
+    sig: str -> list(str) -> bool -> int -> bool -> dict
+    """
+    result = {"file": filename}
+    try:
+        mem_array = new_mem_array(constants.MEM_SIZE)
+        load_program(filename,mem_array,use_image)
+
+        machine = Machine(mem_array[:])
+        if blocks:
+            machine.run_blocks(max_steps)
+        else:
+            machine.run(max_steps)
+        if not machine.halted:
+            raise RuntimeError("Program did not halt within %d steps" % max_steps)
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            print_state(machine.pc,machine.reg_array,machine.mem_array,128)
+        result["steps"] = machine.steps
+        result["state"] = output.getvalue()
+
+        result["caches"] = {}
+        for config in cache_configs:
+            output = io.StringIO()
+            with contextlib.redirect_stdout(output):
+                simulate_cache(mem_array[:],new_reg_array(constants.NUM_REGS),config,max_steps)
+            result["caches"][config] = output.getvalue()
+    except Exception as error:
+        result["error"] = "%s: %s" % (type(error).__name__,error)
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description='Simulate many E20 programs in parallel')
+    parser.add_argument('programs', nargs='+', help=
+        'Directories (searched recursively for .bin files) or glob patterns of programs')
+    parser.add_argument('--cache', action='append', default=[], help=
+        'Cache configuration as for simcache.py, can be given several times')
+    parser.add_argument('--workers', type=int, default=None, help=
+        'Number of worker processes, defaults to the number of CPUs')
+    parser.add_argument('--blocks', action='store_true', help=
+        'Use basic block translation for the runs without caches')
+    parser.add_argument('--max-steps', type=int, default=10000000, help=
+        'Instructions after which a program that has not halted is reported as an error')
+    add_image_arguments(parser)
+    cmdline = parser.parse_args()
+
+    programs = find_programs(cmdline.programs)
+    failed = 0
+    with ProcessPoolExecutor(max_workers=cmdline.workers) as executor:
+        futures = [executor.submit(run_program,filename,cmdline.cache,cmdline.blocks,cmdline.max_steps,cmdline.use_image)
+                   for filename in programs]
+        for future in as_completed(futures): #One JSON object per line, in the order the programs finish
+            result = future.result()
+            if "error" in result:
+                failed += 1
+            print(json.dumps(result),flush=True)
+    if failed:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,367 @@
+#!/usr/bin/python3
+## Throughput benchmarks of the simulators.
+##
+## Every workload, a program from the test directories or a generated long running program, is run
+## on every engine: the plain engine of sim_main.py (run), basic block translation (blocks) and the
+## cache simulator with its log counted instead of written (cache). A trial repeats the workload from
+## its loaded memory until it has run for at least min_time seconds, and the median of the trials
+## is reported as instructions and cache events per second. The blocks engine translates the program
+## in one untimed run first and reuses those translations in every timed run, so its speed leaves out
+## translating, which would otherwise take up most of a short program's run. Results can be stored as a baseline,
+## and a later run compared against it flags workloads that became slower than the tolerance.
+
+import argparse
+import json
+import os
+import sys
+import time
+from array import array
+from collections import namedtuple
+from statistics import median
+from sim_main import *
+from sim_batch import find_programs
+from simcache import *
+
+DEFAULT_CACHE = "32,4,2,256,4,4"
+ENGINES = ["run","blocks","cache"]
+
+# name: the name of the workload in reports and baselines
+# mem_array: the memory of the loaded program, copied for every run
+Workload = namedtuple("Workload", ["name","mem_array"])
+
+# instructions: the instructions executed per second
+# events: the cache events logged per second, 0 for engines without caches
+# spread: the difference between the fastest and slowest trial relative to the median
+BenchResult = namedtuple("BenchResult", ["instructions","events","spread"])
+
+## Encoding of the instructions used by the generated programs
+
+def three_reg(reg_a,reg_b,reg_c,funct):
+    return (reg_a << 10) | (reg_b << 7) | (reg_c << 4) | funct
+
+def two_reg(opcode,reg_a,reg_b,imm):
+    return (opcode << 13) | (reg_a << 10) | (reg_b << 7) | (imm & 0x7F)
+
+def no_reg(opcode,imm):
+    return (opcode << 13) | (imm & MASK13)
+
+def asm_add(reg_c,reg_a,reg_b): return three_reg(reg_a,reg_b,reg_c,0)
+def asm_jr(reg_a): return three_reg(reg_a,0,0,8)
+def asm_addi(reg_b,reg_a,imm): return two_reg(1,reg_a,reg_b,imm)
+def asm_lw(reg_b,imm,reg_a): return two_reg(4,reg_a,reg_b,imm)
+def asm_sw(reg_b,imm,reg_a): return two_reg(5,reg_a,reg_b,imm)
+def asm_jeq(reg_a,reg_b,imm): return two_reg(6,reg_a,reg_b,imm)
+def asm_j(imm): return no_reg(2,imm)
+def asm_jal(imm): return no_reg(3,imm)
+
+## Generated programs. The loop counts and addresses are stored from cell 40 on,
+## where lw with an immediate from $0 reaches them. Every count fits in a 16 bit cell,
+## so longer runs repeat the whole program with an outer loop (see split_count).
+
+PARAMETERS = 40
+MAX_SCALE = 100000 #Keeps every count of synthetic_workloads below 65536 * 65536
+
+def program(code,parameters):
+    """
+    Returns the memory of a generated program: its code from cell 0 and its parameters from cell 40
+    sig: list(int) -> list(int) -> array(int)
+    """
+    mem_array = new_mem_array(constants.MEM_SIZE)
+    mem_array[:len(code)] = array("H",code)
+    mem_array[PARAMETERS:PARAMETERS + len(parameters)] = array("H",parameters)
+    return mem_array
+
+def split_count(count):
+    """
+    Splits a loop count into the count of an outer repeat loop and of the loop inside it,
+    both between 1 and 65535, whose product is about count
+    sig: int -> tuple[int, int]
+    """
+    count = max(1,count)
+    repeat = -(-count // MASK16)
+    if repeat > MASK16:
+        raise Exception("Loop count too large for a generated program: %d" % count)
+    return repeat, max(1,round(count / repeat))
+
+def nested_loops(outer,inner,repeat=1):
+    """
+    Two nested counting loops, repeated repeat times, about repeat * outer * inner * 4 instructions
+    sig: int -> int -> int -> array(int)
+    """
+    code = [asm_lw(4,PARAMETERS + 2,0),   # 0: $4 = repeat
+            asm_lw(1,PARAMETERS,0),       # 1: $1 = outer
+            asm_lw(2,PARAMETERS + 1,0),   # 2: $2 = inner
+            asm_add(3,3,2),               # 3: inner loop
+            asm_addi(2,2,-1),
+            asm_jeq(2,0,1),
+            asm_j(3),
+            asm_addi(1,1,-1),             # 7: outer loop
+            asm_jeq(1,0,1),
+            asm_j(2),
+            asm_addi(4,4,-1),             # 10: repeat loop
+            asm_jeq(4,0,1),
+            asm_j(1),
+            asm_j(13)]                    # 13: halt
+    return program(code,[outer,inner,repeat])
+
+def memory_copy(passes,length,source=1024,dest=4096,repeat=1):
+    """
+    Copies length cells from source to dest, passes times, all of it repeated repeat times,
+    about repeat * passes * length * 7 instructions
+    sig: int -> int -> int -> int -> int -> array(int)
+    """
+    code = [asm_lw(6,PARAMETERS + 4,0),   # 0: $6 = repeat
+            asm_lw(5,PARAMETERS,0),       # 1: $5 = passes
+            asm_lw(1,PARAMETERS + 2,0),   # 2: $1 = source
+            asm_lw(2,PARAMETERS + 3,0),   # 3: $2 = dest
+            asm_lw(3,PARAMETERS + 1,0),   # 4: $3 = length
+            asm_lw(4,0,1),                # 5: copy loop
+            asm_sw(4,0,2),
+            asm_addi(1,1,1),
+            asm_addi(2,2,1),
+            asm_addi(3,3,-1),
+            asm_jeq(3,0,1),
+            asm_j(5),
+            asm_addi(5,5,-1),             # 12: next pass
+            asm_jeq(5,0,1),
+            asm_j(2),
+            asm_addi(6,6,-1),             # 15: repeat loop
+            asm_jeq(6,0,1),
+            asm_j(1),
+            asm_j(18)]                    # 18: halt
+    mem_array = program(code,[passes,length,source,dest,repeat])
+    for addr in range(source,source + length): #Something other than zeros to copy
+        mem_array[addr] = addr * 2654435761 & MASK16
+    return mem_array
+
+def calls(count,repeat=1):
+    """
+    A loop calling a function that calls another, with jal and jr, repeated repeat times,
+    about repeat * count * 11 instructions
+    sig: int -> int -> array(int)
+    """
+    code = [asm_lw(5,PARAMETERS + 1,0),   # 0: $5 = repeat
+            asm_lw(1,PARAMETERS,0),       # 1: $1 = count
+            asm_jal(10),                  # 2: loop
+            asm_addi(1,1,-1),
+            asm_jeq(1,0,1),
+            asm_j(2),
+            asm_addi(5,5,-1),             # 6: repeat loop
+            asm_jeq(5,0,1),
+            asm_j(1),
+            asm_j(9),                     # 9: halt
+            asm_addi(2,2,1),              # 10: first function, keeps its return address in $6
+            asm_add(3,3,2),
+            asm_add(6,7,0),
+            asm_jal(16),
+            asm_jr(6),
+            asm_j(15),                    # 15: never reached
+            asm_addi(4,4,1),              # 16: second function
+            asm_jr(7)]
+    return program(code,[count,repeat])
+
+def synthetic_workloads(scale=1.0):
+    """
+    Returns the generated workloads, each running about scale * 250000 instructions
+    sig: float -> list(Workload)
+    """
+    repeat, outer = split_count(int(250 * scale))
+    nested = nested_loops(outer,250,repeat)
+    repeat, passes = split_count(int(35 * scale))
+    copy = memory_copy(passes,1024,repeat=repeat)
+    repeat, count = split_count(int(22500 * scale))
+    return [Workload("synthetic/nested-loops",nested),
+            Workload("synthetic/memory-copy",copy),
+            Workload("synthetic/calls",calls(count,repeat))]
+
+def program_workloads(patterns,use_image=True):
+    """
+    Returns a workload for every program found by find_programs, loaded with load_program
+    sig: list(str) -> bool -> list(Workload)
+    """
+    workloads = []
+    for filename in find_programs(patterns):
+        mem_array = new_mem_array(constants.MEM_SIZE)
+        load_program(filename,mem_array,use_image)
+        workloads.append(Workload(filename,mem_array))
+    return workloads
+
+def write_program(filename,mem_array):
+    """
+    Writes a generated program as a machine code file, up to its last cell other than zero
+    sig: str -> array(int) -> NoneType
+    """
+    last = max((addr for addr, word in enumerate(mem_array) if word),default=-1)
+    with open(filename,"w") as file:
+        for addr in range(last + 1):
+            file.write("ram[%d] = 16'b%s;\n" % (addr,format(mem_array[addr],"016b")))
+
+## Running the benchmarks
+
+def translated_blocks(mem_array,max_steps):
+    """
+    Runs a fresh copy of the program with basic block translation. Returns its translated blocks
+    sig: array(int) -> int -> BlockCache
+    """
+    machine = Machine(mem_array[:])
+    machine.run_blocks(max_steps)
+    return machine.blocks
+
+def run_once(engine,mem_array,cache_config,max_steps,blocks=None):
+    """
+    Runs a fresh copy of the program on the engine. Returns the instructions executed and cache events logged.
+    The blocks engine starts with the translations of blocks, a BlockCache of an earlier run, if given
+    sig: str -> array(int) -> str -> int -> BlockCache -> tuple[int, int]
+    """
+    machine = Machine(mem_array[:])
+    if engine == "run":
+        return machine.run(max_steps), 0
+    if engine == "blocks":
+        if blocks is not None:
+            machine.blocks = blocks.reuse(machine.mem_array)
+        return machine.run_blocks(max_steps), 0
+    counter = SampleCounter()
+    cache_access = hierarchy_access(CacheHierarchy(parse_cache_config(cache_config),counter))
+    machine.mem_hook = lambda instr, pc, addr: cache_access(instr.name,pc,addr)
+    instructions = machine.run(max_steps)
+    return instructions, sum(counter.counts.values())
+
+def trial(engine,mem_array,cache_config,max_steps,min_time,blocks=None):
+    """
+    Repeats the program until it has run for min_time seconds.
+    Returns the instructions and cache events per second
+    sig: str -> array(int) -> str -> int -> float -> BlockCache -> tuple[float, float]
+    """
+    instructions = 0
+    events = 0
+    start = time.perf_counter()
+    while True:
+        run_instructions, run_events = run_once(engine,mem_array,cache_config,max_steps,blocks)
+        instructions += run_instructions
+        events += run_events
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            return instructions / elapsed, events / elapsed
+
+def benchmark(workload,engine,cache_config=DEFAULT_CACHE,max_steps=1000000,trials=5,warmup=1,min_time=0.2):
+    """
+    Measures the workload on the engine: warmup untimed trials, then the median of trials timed trials.
+    The blocks engine first translates the program in a run of its own, whose blocks every later run reuses
+    sig: Workload -> str -> str -> int -> int -> int -> float -> BenchResult
+    """
+    blocks = translated_blocks(workload.mem_array,max_steps) if engine == "blocks" else None
+    for _ in range(warmup):
+        run_once(engine,workload.mem_array,cache_config,max_steps,blocks)
+    results = [trial(engine,workload.mem_array,cache_config,max_steps,min_time,blocks) for _ in range(trials)]
+    speeds = [speed for speed, _ in results]
+    speed = median(speeds)
+    spread = (max(speeds) - min(speeds)) / speed if speed else 0.0
+    return BenchResult(speed,median(events for _, events in results),spread)
+
+def compare(result,baseline,tolerance):
+    """
+    Compares the instructions per second of a result with those of its baseline, a dict as stored
+    by --save-baseline or None. Returns "slower" if it is slower by more than tolerance,
+    "faster" if it is faster by more than tolerance, "same" otherwise and "new" without a baseline
+    sig: BenchResult -> dict -> float -> str
+    """
+    if baseline is None:
+        return "new"
+    if result.instructions < baseline["instructions"] * (1 - tolerance):
+        return "slower"
+    if result.instructions > baseline["instructions"] * (1 + tolerance):
+        return "faster"
+    return "same"
+
+def bench_line(name,engine,result,status,baseline):
+    change = ""
+    if baseline is not None and baseline["instructions"]:
+        change = "%+.1f%%" % (100 * (result.instructions / baseline["instructions"] - 1))
+    return "%-36s %-7s %14.0f %14.0f %7.1f%% %-7s %s" % (name,engine,result.instructions,result.events,
+                                                        100 * result.spread,status,change)
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure the throughput of the E20 simulators')
+    parser.add_argument('programs', nargs='*', default=["tests","tests-cache"], help=
+        'Directories (searched recursively for .bin files) or glob patterns of programs, '
+        'tests and tests-cache by default')
+    parser.add_argument('--no-synthetic', action='store_true', help=
+        'Do not run the generated nested loop, memory copy and call programs')
+    parser.add_argument('--scale', type=float, default=1.0, help=
+        'Size of the generated programs, 1 runs about 250000 instructions each, at most %d' % MAX_SCALE)
+    parser.add_argument('--engines', default=",".join(ENGINES), help=
+        'Comma separated engines to measure: run (sim_main.py), blocks (sim_main.py --blocks) and cache (simcache.py)')
+    parser.add_argument('--cache', default=DEFAULT_CACHE, help=
+        'Cache configuration of the cache engine, as for simcache.py')
+    parser.add_argument('--trials', type=int, default=5, help=
+        'Timed trials per workload and engine, the median is reported')
+    parser.add_argument('--warmup', type=int, default=1, help=
+        'Untimed runs before the trials')
+    parser.add_argument('--min-time', type=float, default=0.2, help=
+        'Seconds every trial runs at least, repeating short programs')
+    parser.add_argument('--max-steps', type=int, help=
+        'Instructions after which a run of a program that does not halt is stopped, '
+        'by default 1000000 or enough for the generated programs of --scale')
+    parser.add_argument('--json', action='store_true', help=
+        'Print one JSON object per workload and engine instead of a table')
+    parser.add_argument('--baseline', help=
+        'Compare with the results stored in this file and exit with status 1 if a workload became slower')
+    parser.add_argument('--save-baseline', help=
+        'Store the results in this file, to compare later runs with')
+    parser.add_argument('--tolerance', type=float, default=0.1, help=
+        'Relative change of instructions per second that is reported as slower or faster')
+    parser.add_argument('--emit', help=
+        'Write the generated programs as .bin files to this directory and exit')
+    add_image_arguments(parser)
+    cmdline = parser.parse_args()
+    engines = cmdline.engines.split(",")
+    for engine in engines:
+        if engine not in ENGINES:
+            parser.error("unknown engine: %s" % engine)
+    if not 0 < cmdline.scale <= MAX_SCALE:
+        parser.error("--scale must be above 0 and at most %d" % MAX_SCALE)
+    if cmdline.max_steps is None:
+        cmdline.max_steps = max(1000000,int(400000 * cmdline.scale))
+
+    synthetic = [] if cmdline.no_synthetic else synthetic_workloads(cmdline.scale)
+    if cmdline.emit is not None:
+        os.makedirs(cmdline.emit,exist_ok=True)
+        for workload in synthetic_workloads(cmdline.scale):
+            write_program(os.path.join(cmdline.emit,os.path.basename(workload.name) + ".bin"),workload.mem_array)
+        return
+    workloads = program_workloads(cmdline.programs,cmdline.use_image) + synthetic
+
+    baselines = {}
+    if cmdline.baseline is not None:
+        with open(cmdline.baseline) as file:
+            baselines = json.load(file)
+
+    results = {}
+    slower = 0
+    if not cmdline.json:
+        if "blocks" in engines:
+            print("blocks reuses the translations of an untimed first run, its speed leaves out translating")
+        print("%-36s %-7s %14s %14s %8s %-7s %s" % ("workload","engine","instr/s","events/s","spread","status","change"))
+    for workload in workloads:
+        for engine in engines:
+            key = "%s %s" % (workload.name,engine)
+            result = benchmark(workload,engine,cmdline.cache,cmdline.max_steps,cmdline.trials,
+                               cmdline.warmup,cmdline.min_time)
+            results[key] = result._asdict()
+            status = compare(result,baselines.get(key),cmdline.tolerance)
+            slower += status == "slower"
+            if cmdline.json:
+                print(json.dumps({"workload": workload.name, "engine": engine, "status": status,
+                                  **result._asdict()}),flush=True)
+            else:
+                print(bench_line(workload.name,engine,result,status,baselines.get(key)),flush=True)
+
+    if cmdline.save_baseline is not None:
+        with open(cmdline.save_baseline,"w") as file:
+            json.dump(results,file,indent=1,sort_keys=True)
+    if slower:
+        print("%d workloads became slower than the baseline" % slower,file=sys.stderr)
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+## Translation of straight-line basic blocks of E20 code into compiled Python functions
+from sim_helpers import *
+from sim_predecode import *
+
+MAX_BLOCK_LEN = 64 #Longest block that is translated in one piece
+
+def instr_source(instr,k):
+    """ 
+    Generates the Python source lines executing the decoded instruction at offset k in its block.
+    pc is the program counter at the start of the block, r the registers and m the memory.
+    A block ends with the first line that returns the next program counter
+    sig: DecodedInstr -> int -> list(str)
+    """
+    name, handler, op1, op2, op3, halt, mem_access = instr
+    here = "pc + %d" % k
+    match name:
+        case "add" | "sub" | "or" | "and":
+            if op3 == 0:
+                return ["r[0] = 0"]
+            operator = {"add": "+", "sub": "-", "or": "|", "and": "&"}[name]
+            return ["r[%d] = (r[%d] %s r[%d]) & 65535" % (op3,op1,operator,op2)]
+        case "slt":
+            if op3 == 0:
+                return ["if r[%d] >= r[%d]: r[0] = 0" % (op1,op2)]
+            return ["r[%d] = 1 if r[%d] < r[%d] else 0" % (op3,op1,op2)]
+        case "slti":
+            if op2 == 0:
+                return ["if r[%d] >= %d: r[0] = 0" % (op1,op3)]
+            return ["r[%d] = 1 if r[%d] < %d else 0" % (op2,op1,op3)]
+        case "addi":
+            if op2 == 0:
+                return ["r[0] = 0"]
+            return ["r[%d] = (r[%d] + %d) & 65535" % (op2,op1,op3)]
+        case "lw":
+            if op2 == 0:
+                return ["r[0] = 0"]
+            return ["r[%d] = m[(r[%d] + %d) & 8191]" % (op2,op1,op3)]
+        case "sw":
+            return ["m[(r[%d] + %d) & 8191] = r[%d]" % (op1,op3,op2),
+                    "return (%s + 1) & 65535" % here]
+        case "jeq":
+            return ["if r[%d] == r[%d]: return (%s + 1 + %d) & 65535" % (op1,op2,here,op3),
+                    "return (%s + 1) & 65535" % here]
+        case "j":
+            return ["return %d" % op1]
+        case "jal":
+            return ["r[7] = (%s + 1) & 65535" % here,
+                    "return %d" % op1]
+        case "jr":
+            return ["return r[%d]" % op1]
+        case _:
+            return []
+
+def translate_block(mem_array,start):
+    """ 
+    Discovers the basic block starting at the 13 bit address start and compiles it.
+    The block ends after the first jump, branch or sw, before a halt instruction,
+    at the end of memory or after MAX_BLOCK_LEN instructions.
+    Returns the compiled function, the amount of instructions in the block and the
+    decoded sw that ends the block (or None), or None if start holds a halt instruction
+    sig: list(int) -> int -> tuple[function, int, DecodedInstr] 
+    """
+    lines = []
+    last_sw = None
+    length = 0
+    addr = start
+    ended = False
+    while not ended and length < MAX_BLOCK_LEN and addr < len(mem_array):
+        instr = predecode(mem_array[addr],addr)
+        if instr.halt:
+            break
+        instr_lines = instr_source(instr,length)
+        ended = len(instr_lines) > 0 and instr_lines[-1].startswith("return")
+        if ended and instr.name == "sw":
+            last_sw = instr
+        lines += instr_lines
+        length += 1
+        addr += 1
+    if length == 0:
+        return None
+    if not ended:
+        lines.append("return (pc + %d) & 65535" % length)
+
+    source = "def block_%d(pc, m, r):\n" % start + "".join("    %s\n" % line for line in lines)
+    namespace = {}
+    exec(compile(source,"<block %d>" % start,"exec"),namespace)
+    return namespace["block_%d" % start], length, last_sw
+
+class BlockCache:
+    """
+    Caches the compiled basic blocks of a program by their 13 bit start address.
+    
+    Attributes:
+        mem_array (list(int)): The memory the blocks are translated from.
+        blocks (dict[int,tuple]): The translated block per start address, as returned by translate_block.
+        covering (dict[int,list(int)]): For every address, the start addresses of the blocks containing it.
+    """
+    def __init__(self,mem_array):
+        self.mem_array = mem_array
+        self.blocks = {}
+        self.covering = {}
+
+    def fetch(self,start):
+        """
+        Returns the translated block starting at start, translating it on first use.
+        Returns None if start holds a halt instruction
+        sig: int -> tuple[function, int, DecodedInstr]
+        """
+        block = self.blocks.get(start)
+        if block is None:
+            block = translate_block(self.mem_array,start)
+            if block is None:
+                return None
+            self.blocks[start] = block
+            for addr in range(start,start + block[1]):
+                self.covering.setdefault(addr,[]).append(start)
+        return block
+
+    def reuse(self,mem_array):
+        """
+        Returns a BlockCache of mem_array holding the blocks of this one that translate the same from it,
+        those whose cells and the cell after them hold the same words in both memories
+        sig: array(int) -> BlockCache
+        """
+        cache = BlockCache(mem_array)
+        for start, block in self.blocks.items():
+            end = start + block[1]
+            if self.mem_array[start:end + 1] == mem_array[start:end + 1]:
+                cache.blocks[start] = block
+                for addr in range(start,end):
+                    cache.covering.setdefault(addr,[]).append(start)
+        return cache
+
+    def invalidate(self,addr):
+        """
+        Drops every block containing addr, which has to be done whenever the cell is written to
+        sig: int -> NoneType
+        """
+        starts = self.covering.pop(addr,None)
+        if starts is not None:
+            for start in starts:
+                self.blocks.pop(start,None)
@@ -0,0 +1,108 @@
+#!/usr/bin/python3
+## Evaluation of branch predictors on the jeq instructions of a program.
+## The outcome of every executed jeq is recorded from a single run of the program,
+## and every predictor is then evaluated on the recorded outcomes.
+
+import argparse
+from sim_main import *
+from sim_machine import *
+from sim_predictors import *
+from simcache_sweep import int_list
+
+class BranchRecorder:
+    """
+    Records every executed jeq, used as the step_hook of a Machine.
+
+    Attributes:
+        reg_array (array(int)): The registers of the machine, to find the outcome of jeq.
+        branches (list(tuple[int,int,bool])): The (pc, target, taken) of every jeq in execution order.
+    """
+    def __init__(self,reg_array):
+        self.reg_array = reg_array
+        self.branches = []
+
+    def step(self,instr,pc,next_pc):
+        if instr.name == "jeq":
+            target = (pc + 1 + instr.op3) & MASK16
+            self.branches.append((pc,target,self.reg_array[instr.op1] == self.reg_array[instr.op2]))
+
+def record_branches(mem_array,max_steps=None):
+    """
+    Runs the program loaded into mem_array and returns the (pc, target, taken) of every executed jeq
+    sig: array(int) -> int -> list(tuple[int,int,bool])
+    """
+    machine = Machine(mem_array)
+    recorder = BranchRecorder(machine.reg_array)
+    machine.step_hook = recorder.step
+    machine.run(max_steps)
+    return recorder.branches
+
+def evaluate(branches,predictors):
+    """
+    Lets every predictor predict every branch in order, and tells it the outcome afterwards.
+    predictors is a dict from name to predictor. Returns a dict from name to a dict
+    from the pc of every branch to the amount of its correct predictions
+    sig: list(tuple[int,int,bool]) -> dict[str,object] -> dict[str,dict[int,int]]
+    """
+    correct = {name: {} for name in predictors}
+    for name, predictor in predictors.items():
+        counts = correct[name]
+        for pc, target, taken in branches:
+            if predictor.predict(pc,target) == taken:
+                counts[pc] = counts.get(pc,0) + 1
+            predictor.update(pc,target,taken)
+    return correct
+
+def branch_summary(branches):
+    """
+    Returns a dict from the pc of every branch to its target, executions and times taken
+    sig: list(tuple[int,int,bool]) -> dict[int,list]
+    """
+    summary = {}
+    for pc, target, taken in branches:
+        entry = summary.setdefault(pc,[target,0,0])
+        entry[1] += 1
+        entry[2] += taken
+    return summary
+
+def main():
+    parser = argparse.ArgumentParser(description='Evaluate branch predictors on the jeq of an E20 program')
+    parser.add_argument('filename', help='The file containing machine code, typically with .bin suffix')
+    parser.add_argument('--bimodal-sizes', type=int_list, default=[16,64,256], help=
+        'Comma separated table sizes of the bimodal predictors')
+    parser.add_argument('--gshare-sizes', type=int_list, default=[64,256,1024], help=
+        'Comma separated table sizes of the gshare predictors')
+    parser.add_argument('--history-bits', type=int_list, default=[4,8], help=
+        'Comma separated history lengths of the gshare predictors, every size is tried with every length')
+    parser.add_argument('--per-branch', action='store_true', help=
+        'Also print the accuracy of every predictor on every branch')
+    add_image_arguments(parser)
+    cmdline = parser.parse_args()
+    mem_array = new_mem_array(constants.MEM_SIZE)
+    load_program(cmdline.filename,mem_array,cmdline.use_image)
+
+    predictors = {"always-taken": StaticPredictor("taken"), "backward-taken": StaticPredictor("backward")}
+    for size in cmdline.bimodal_sizes:
+        predictors["bimodal-%d" % size] = BimodalPredictor(size)
+    for size in cmdline.gshare_sizes:
+        for history_bits in cmdline.history_bits:
+            predictors["gshare-%d-h%d" % (size,history_bits)] = GsharePredictor(size,history_bits)
+
+    branches = record_branches(mem_array)
+    correct = evaluate(branches,predictors)
+
+    print("%-18s %9s %9s %9s" % ("predictor","correct","branches","accuracy"))
+    for name in predictors:
+        right = sum(correct[name].values())
+        accuracy = right / len(branches) if branches else 1.0
+        print("%-18s %9d %9d %9.4f" % (name,right,len(branches),accuracy))
+
+    if cmdline.per_branch:
+        summary = branch_summary(branches)
+        for pc, (target, executions, taken) in sorted(summary.items()):
+            print("pc:%5d\ttarget:%5d\texecuted:%d\ttaken:%d" % (pc,target,executions,taken))
+            for name in predictors:
+                print("  %-18s %9.4f" % (name,correct[name].get(pc,0) / executions))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+## Checkpoints of a running E20 machine, so a long run can be stopped and resumed later.
+##
+## A checkpoint is a CHECKPOINT_HEADER (magic, length of the state) followed by the state as JSON:
+## pc, registers, instructions executed, if the machine halted, and optionally the contents of the
+## caches (see CacheHierarchy.get_state). Memory follows as pages of PAGE_WORDS cells, each a
+## PAGE_HEADER with the number of the page and its cells as little endian unsigned 16 bit integers.
+## Pages that only hold zeros are left out, so a checkpoint of a small program stays small.
+
+from array import array
+import json
+import os
+import struct
+import sys
+from sim_machine import *
+
+CHECKPOINT_MAGIC = b"E20CKP1\0"
+CHECKPOINT_HEADER = struct.Struct("<8sI")
+PAGE_HEADER = struct.Struct("<H")
+PAGE_WORDS = 256
+
+def nonzero_pages(mem):
+    """
+    Returns the number and contents of every page of memory that holds a cell other than 0
+    sig: array(int) -> list(tuple[int, array(int)])
+    """
+    pages = []
+    for number in range((len(mem) + PAGE_WORDS - 1) // PAGE_WORDS):
+        page = mem[number * PAGE_WORDS:(number + 1) * PAGE_WORDS]
+        if any(page):
+            pages.append((number,page))
+    return pages
+
+def save_checkpoint(filename,machine,cache_state=None):
+    """
+    Writes the state of the machine, and the state of its caches if given, to filename.
+    The checkpoint is written to a temporary file first, so a reader never sees half a checkpoint
+    sig: str -> Machine -> dict -> NoneType
+    """
+    state = {"pc": machine.pc, "regs": list(machine.reg_array), "steps": machine.steps,
+             "halted": machine.halted, "memory": len(machine.mem_array), "caches": cache_state}
+    data = json.dumps(state).encode()
+    temporary = "%s.%d.tmp" % (filename,os.getpid())
+    with open(temporary,"wb") as file:
+        file.write(CHECKPOINT_HEADER.pack(CHECKPOINT_MAGIC,len(data)))
+        file.write(data)
+        for number, page in nonzero_pages(machine.mem_array):
+            if sys.byteorder == "big":
+                page.byteswap()
+            file.write(PAGE_HEADER.pack(number))
+            file.write(page.tobytes())
+    os.replace(temporary,filename)
+
+def load_checkpoint(filename,mem_array,reg_array):
+    """
+    Restores the checkpoint in filename into the zeroed memory and registers.
+    Returns a Machine that continues where the checkpointed one stopped,
+    and the state of the caches or None if the checkpoint has none
+    sig: str -> array(int) -> array(int) -> tuple[Machine, dict]
+    """
+    with open(filename,"rb") as file:
+        header = file.read(CHECKPOINT_HEADER.size)
+        if len(header) != CHECKPOINT_HEADER.size or header[:len(CHECKPOINT_MAGIC)] != CHECKPOINT_MAGIC:
+            raise Exception("Not a checkpoint: %s" % filename)
+        _, length = CHECKPOINT_HEADER.unpack(header)
+        state = json.loads(file.read(length).decode())
+        if state["memory"] != len(mem_array) or len(state["regs"]) != len(reg_array):
+            raise Exception("Checkpoint does not match the size of the machine")
+        while True:
+            page_header = file.read(PAGE_HEADER.size)
+            if not page_header:
+                break
+            number, = PAGE_HEADER.unpack(page_header)
+            start = number * PAGE_WORDS
+            page = array("H")
+            page.frombytes(file.read(2 * min(PAGE_WORDS,len(mem_array) - start)))
+            if sys.byteorder == "big":
+                page.byteswap()
+            mem_array[start:start + len(page)] = page
+    reg_array[:] = array("H",state["regs"])
+    machine = Machine(mem_array,reg_array,state["pc"])
+    machine.steps = state["steps"]
+    machine.halted = state["halted"]
+    return machine, state["caches"]
+
+def run_until(machine,step=None,pc=None):
+    """
+    Runs the machine until it has executed step instructions in total, counting those
+    before it was checkpointed, or until it is about to execute the instruction at pc,
+    whichever comes first. Without either it runs until the program halts.
+    Warns on the standard error if the program halted without reaching pc
+    sig: Machine -> int -> int -> int
+    """
+    max_steps = None if step is None else max(0,step - machine.steps)
+    if pc is None:
+        return machine.run(max_steps)
+    count = machine.run_to(pc,max_steps)
+    if machine.halted:
+        print("Warning: the program halted at pc %d before reaching pc %d" % (machine.pc,pc),file=sys.stderr)
+    return count
+
+def add_checkpoint_arguments(parser):
+    """
+    Adds the command line options to write and resume checkpoints to an ArgumentParser
+    sig: ArgumentParser -> NoneType
+    """
+    parser.add_argument('--checkpoint', help=
+        'Stop at the point chosen by --checkpoint-step or --checkpoint-pc, or when the program halts, '
+        'and write the state of the machine to this file')
+    parser.add_argument('--checkpoint-step', type=int, help=
+        'Write the checkpoint after this many instructions in total')
+    parser.add_argument('--checkpoint-pc', type=int, help=
+        'Write the checkpoint when the instruction at this address is about to be executed')
+    parser.add_argument('--resume', action='store_true', help=
+        'The file is a checkpoint to continue from instead of machine code')
+
+def check_checkpoint_arguments(parser,cmdline):
+    """
+    Reports an error through the parser if --checkpoint-step or --checkpoint-pc is given without --checkpoint
+    sig: ArgumentParser -> Namespace -> NoneType
+    """
+    if cmdline.checkpoint is None:
+        for option, value in (("--checkpoint-step",cmdline.checkpoint_step),("--checkpoint-pc",cmdline.checkpoint_pc)):
+            if value is not None:
+                parser.error("%s needs --checkpoint" % option)
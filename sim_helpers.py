@@ -1,80 +1,142 @@
+## Integer bit field helpers
+## These work directly on the 16 bit instruction words and register values,
+## the string based helpers further down are kept for compatibility.
+MASK16 = 0xFFFF
+MASK13 = 0x1FFF
+MASK7 = 0x7F
+
+def wrap16(num):
+    """
+    Wraps a number around to the 16 bit range of the E20 registers
+    sig: int -> int
+    """
+    return num & MASK16
+
+def opcode_bits(word):
+    """
+    Extracts the 3 bit opcode of an instruction word
+    sig: int -> int
+    """
+    return word >> 13
+
+def reg_a_bits(word):
+    """
+    Extracts the first register number (bits 12-10) of an instruction word
+    sig: int -> int
+    """
+    return (word >> 10) & 7
+
+def reg_b_bits(word):
+    """
+    Extracts the second register number (bits 9-7) of an instruction word
+    sig: int -> int
+    """
+    return (word >> 7) & 7
+
+def reg_c_bits(word):
+    """
+    Extracts the third register number (bits 6-4) of a three register instruction word
+    sig: int -> int
+    """
+    return (word >> 4) & 7
+
+def funct_bits(word):
+    """
+    Extracts the 4 bit function code of a three register instruction word
+    sig: int -> int
+    """
+    return word & 15
+
+def imm7_bits(word):
+    """
+    Extracts the 7 bit immediate of a two register instruction word
+    sig: int -> int
+    """
+    return word & MASK7
+
+def imm13_bits(word):
+    """
+    Extracts the 13 bit immediate of a zero register instruction word
+    sig: int -> int
+    """
+    return word & MASK13
+
+def sign_extend_bits(num,bits):
+    """
+    Sign extends the two's complement number num of the given bit width to 16 bits
+    sig: int -> int -> int
+    """
+    sign_bit = 1 << (bits - 1)
+    if num & sign_bit:
+        num |= MASK16 ^ ((sign_bit << 1) - 1)
+    return num
+
+def is_halt_word(word,addr):
+    """
+    Checks if the instruction word stored at the 13 bit address addr is the halt instruction,
+    i.e. a j to its own address
+    sig: int -> int -> bool
+    """
+    return word == (2 << 13) | addr
+
 ## Helper Functions
 def decimal_to_binary(dec_num):
     """
     Converts a decimal number to a binary number
     sig: int -> int
     """
-    bin_num = ""
-    if dec_num == 0:
-        bin_num = "0"
-    while dec_num != 0:
-        rem = dec_num%2
-        if rem == 1:
-            bin_num = "1"+bin_num
-        else:
-            bin_num = "0"+bin_num
-        dec_num = dec_num//2
-    return int(bin_num)
+    return int(format(dec_num,"b"))
 
 def bin_to_dec(num):
     """
     Converts a binary number string to a decimal number
     sig: str -> int
     """
-    dec_num = 0
-    for i in range(len(num)):
-        dec_num += 2**i * int(num[len(num)-1-i])
-    return dec_num
+    if num == "":
+        return 0
+    return int(num,2)
 
 def bin_to_instruction(bin_num):
     """ 
     Converts a binary string to a valid instruction
     sig: str -> str
     """
-    bin = str(bin_num)
-    instruction = ""
-    if len(bin) < 16:
-        for i in range(16-len(bin)):
-            bin = "0"+bin
-    return bin
+    return str(bin_num).zfill(16)
 
 def bit16_to_bit13(num):
     """
     Extracts the last 13 bit of a binary number
     sig: int -> int
     """
-    bin = bin_to_instruction(decimal_to_binary(num))
-    bin2 = bin[3:]
-    return bin_to_dec(bin2)
+    return num & MASK13
 
 def check_halt(curr_instr,pc):
     """ 
     Checks if the given instructions ia the halt instruction
     sig: str -> int -> bool
     """ 
-    curr_addr = bin_to_instruction(decimal_to_binary(pc))[3:]
-    halt_instr = "010" + curr_addr
-    if curr_instr == halt_instr:
-        return True
+    return is_halt_word(int(curr_instr,2),pc & MASK13)
 
 def sign_extend(num):
     """ 
     Extends the sign of a 7-bit instruction to a 16-bit instruction
     sig: int -> int
     """
-    if num > 63:
-        num += 65408
-    return num
+    return sign_extend_bits(num,7)
+
+def effective_addr(regnum,signed_imm):
+    """ 
+    Calculates the memory address for the sw and lw instructions from an already sign extended immediate
+    sig: int -> int -> int
+    """
+    return (regnum + signed_imm) & MASK13
 
 def mem_addr(regnum,imm):
     """ 
     Calculates the appropriate memory address for the sw and lw instructions
-    sig: int -> int -> int
+    sig: int -> str -> int
     """
-    num = regnum + sign_extend(bin_to_dec(imm))
-    if num > 65535:
-        num = num - 65536
-    return bit16_to_bit13(num)
+    return effective_addr(regnum,sign_extend(bin_to_dec(imm)))
 
 def determine_reg_amount(instruction):
     """ 
@@ -0,0 +1,123 @@
+#!/usr/bin/python3
+## Binary program images, so a machine code file only has to be parsed once.
+##
+## An image is an IMAGE_HEADER (magic, amount of words, SHA-256 of the source file) followed by
+## the words of memory from address 0 on as little endian unsigned 16 bit integers, which are
+## read directly into the memory buffer. load_program keeps the image of every .bin file it
+## parses in the user's cache directory, named by the hash of the .bin file, and reuses it while
+## the .bin file is unchanged. Nothing is written next to the programs themselves.
+
+import argparse
+import hashlib
+import os
+import struct
+import sys
+
+IMAGE_MAGIC = b"E20IMG1\0"
+IMAGE_HEADER = struct.Struct("<8sI32s")
+
+def source_hash(data):
+    """
+    Returns the hash of the contents of a source file stored in its image
+    sig: bytes -> bytes
+    """
+    return hashlib.sha256(data).digest()
+
+def image_cache_dir():
+    """
+    Returns the directory the images of parsed programs are cached in:
+    e20sim in $XDG_CACHE_HOME, or in ~/.cache if it is not set
+    sig: NoneType -> str
+    """
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"),".cache")
+    return os.path.join(base,"e20sim")
+
+def image_path(digest):
+    """
+    Returns the path of the cached image of the machine code file with the given hash
+    sig: bytes -> str
+    """
+    return os.path.join(image_cache_dir(),digest.hex() + ".e20img")
+
+def write_image(path,mem,count,digest):
+    """
+    Writes the first count words of mem as an image of the source with the given hash.
+    The image is written to a temporary file first, so a reader never sees half an image
+    sig: str -> array(int) -> int -> bytes -> NoneType
+    """
+    words = mem[:count]
+    if sys.byteorder == "big":
+        words.byteswap()
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory,exist_ok=True)
+    temporary = "%s.%d.tmp" % (path,os.getpid())
+    with open(temporary,"wb") as file:
+        file.write(IMAGE_HEADER.pack(IMAGE_MAGIC,count,digest))
+        file.write(words.tobytes())
+    os.replace(temporary,path)
+
+def read_image(path,mem,digest=None):
+    """
+    Reads the image at path directly into the memory buffer mem.
+    If digest is given, the image is only used if it was made from a source with that hash.
+    Returns the amount of words read, or None if there is no usable image
+    sig: str -> array(int) -> bytes -> int
+    """
+    try:
+        file = open(path,"rb")
+    except OSError:
+        return None
+    with file:
+        header = file.read(IMAGE_HEADER.size)
+        if len(header) != IMAGE_HEADER.size:
+            return None
+        magic, count, image_digest = IMAGE_HEADER.unpack(header)
+        if magic != IMAGE_MAGIC or count > len(mem) or (digest is not None and image_digest != digest):
+            return None
+        with memoryview(mem) as view, view.cast("B") as cells:
+            if file.readinto(cells[:2 * count]) != 2 * count:
+                return None
+    if sys.byteorder == "big":
+        words = mem[:count]
+        words.byteswap()
+        mem[:count] = words
+    return count
+
+def is_image(data):
+    """
+    Checks if the contents of a file are an image rather than machine code
+    sig: bytes -> bool
+    """
+    return data[:len(IMAGE_MAGIC)] == IMAGE_MAGIC
+
+def add_image_arguments(parser):
+    """
+    Adds the command line option to turn off the image cache to an ArgumentParser
+    sig: ArgumentParser -> NoneType
+    """
+    parser.add_argument('--no-image-cache', dest='use_image', action='store_false', help=
+        'Always parse the machine code, without reading or writing cached images in ' + image_cache_dir())
+
+def main():
+    from sim_main import constants, load_program, new_mem_array
+
+    parser = argparse.ArgumentParser(description='Build the binary images of E20 machine code files')
+    parser.add_argument('filenames', nargs='+', help=
+        'The files containing machine code, typically with .bin suffix')
+    parser.add_argument('--output', help=
+        'Write the image of a single file here instead of to the image cache. '
+        'The simulators load such an image when it is given instead of the .bin file')
+    cmdline = parser.parse_args()
+    if cmdline.output is not None and len(cmdline.filenames) != 1:
+        parser.error("--output needs exactly one file")
+
+    for filename in cmdline.filenames:
+        mem_array = new_mem_array(constants.MEM_SIZE)
+        count = load_program(filename,mem_array)
+        if cmdline.output is not None:
+            with open(filename,"rb") as file:
+                write_image(cmdline.output,mem_array,count,source_hash(file.read()))
+
+if __name__ == "__main__":
+    main()
@@ -1,20 +1,17 @@
 ## Functions to execute the different instructions of the E20 processot
+## The imm of the two register instructions is passed already sign extended to 16 bits
 from sim_helpers import *
 
 def addi(prog_rg1,prog_rg2,imm,next_pc,mem_array,reg_array):
     """ 
     Executes the addi instruction as described in the E20 manual.
     Returns the program counter after execution
-    sig: int -> int -> str -> int -> list(int) -> list(int) -> int 
+    sig: int -> int -> int -> int -> list(int) -> list(int) -> int 
     """
-    signed_imm = sign_extend(bin_to_dec((imm)))
     if prog_rg2 == 0:
         reg_array[prog_rg2] = 0
     else:
-        storeval = reg_array[prog_rg1] + signed_imm
-        if storeval > 65535:
-            storeval = storeval - 65536
-        reg_array[prog_rg2] = storeval
+        reg_array[prog_rg2] = (reg_array[prog_rg1] + imm) & MASK16
     next_pc += 1
     return next_pc
 
@@ -22,11 +19,10 @@ def jeq(prog_rg1,prog_rg2,imm,next_pc,mem_array,reg_array):
     """ 
     Executes the jeq instruction as described in the E20 manual.
     Returns the program counter after execution
-    sig: int -> int -> str -> int -> list(int) -> list(int) -> int 
+    sig: int -> int -> int -> int -> list(int) -> list(int) -> int 
     """
-    signed_imm = bin_to_dec(imm)
     if reg_array[prog_rg1] == reg_array[prog_rg2]:
-        next_pc = next_pc + 1 + sign_extend(signed_imm)
+        next_pc = next_pc + 1 + imm
     else:
         next_pc += 1
     return next_pc
@@ -35,9 +31,9 @@ def sw(prog_rg1,prog_rg2,imm,next_pc,mem_array,reg_array):
     """ 
     Executes the sw instruction as described in the E20 manual.
     Returns the program counter after execution
-    sig: int -> int -> str -> int -> list(int) -> list(int) -> int 
+    sig: int -> int -> int -> int -> list(int) -> list(int) -> int 
     """
-    mem_num = mem_addr(reg_array[prog_rg1],imm)
+    mem_num = effective_addr(reg_array[prog_rg1],imm)
     mem_array[mem_num] = reg_array[prog_rg2]
     next_pc += 1
     return next_pc
@@ -46,9 +42,9 @@ def lw(prog_rg1,prog_rg2,imm,next_pc,mem_array,reg_array):
     """ 
     Executes the lw instruction as described in the E20 manual.
     Returns the program counter after execution
-    sig: int -> int -> str -> int -> list(int) -> list(int) -> int 
+    sig: int -> int -> int -> int -> list(int) -> list(int) -> int 
     """
-    mem_num = mem_addr(reg_array[prog_rg1],imm)
+    mem_num = effective_addr(reg_array[prog_rg1],imm)
     if prog_rg2 == 0:
         reg_array[prog_rg2] = 0
     else:
@@ -60,10 +56,9 @@ def slti(prog_rg1,prog_rg2,imm,next_pc,mem_array,reg_array):
     """ 
     Executes the slti instruction as described in the E20 manual.
     Returns the program counter after execution
-    sig: int -> int -> str -> int -> list(int) -> list(int) -> int 
+    sig: int -> int -> int -> int -> list(int) -> list(int) -> int 
     """   
-    unsigned_imm = sign_extend(bin_to_dec(imm))
-    if reg_array[prog_rg1] < unsigned_imm:
+    if reg_array[prog_rg1] < imm:
         if prog_rg2 != 0:
             reg_array[prog_rg2] = 1
     else:
@@ -77,15 +72,10 @@ def add(prog_rg1,prog_rg2,prog_rg3,next_pc,mem_array,reg_array):
     Returns the program counter after execution
     sig: int -> int -> int -> int -> list(int) -> list(int) -> int 
     """
-    store_val = 0
-    if reg_array[prog_rg1] + reg_array[prog_rg2] > 65535:
-        store_val = reg_array[prog_rg1] + reg_array[prog_rg2] - 65536
-    else:
-        store_val = reg_array[prog_rg1] + reg_array[prog_rg2]
     if prog_rg3 == 0:
         reg_array[prog_rg3] = 0
     else:
-        reg_array[prog_rg3] = store_val
+        reg_array[prog_rg3] = (reg_array[prog_rg1] + reg_array[prog_rg2]) & MASK16
     next_pc += 1
     return next_pc
 
@@ -95,15 +85,10 @@ def sub(prog_rg1,prog_rg2,prog_rg3,next_pc,mem_array,reg_array):
     Returns the program counter after execution
     sig: int -> int -> int -> int -> list(int) -> list(int) -> int 
     """
-    store_val = 0
-    if reg_array[prog_rg1] - reg_array[prog_rg2] < 0:
-        store_val = 65536 + (reg_array[prog_rg1] - reg_array[prog_rg2])
-    else:
-        store_val = reg_array[prog_rg1] - reg_array[prog_rg2]
     if prog_rg3 == 0:
         reg_array[prog_rg3] = 0
     else:
-        reg_array[prog_rg3] = store_val
+        reg_array[prog_rg3] = (reg_array[prog_rg1] - reg_array[prog_rg2]) & MASK16
     next_pc += 1
     return next_pc
 
@@ -171,9 +156,6 @@ def jal(imm,next_pc,reg_array):
     Returns the program counter after execution
     sig: int -> int -> list(int) -> int
     """
-    store = next_pc + 1
-    if store > 65535:
-        store = store - 65536
-    reg_array[7] = store
+    reg_array[7] = (next_pc + 1) & MASK16
     next_pc = imm
     return next_pc
\ No newline at end of file
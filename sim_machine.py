@@ -0,0 +1,198 @@
+## Fetch/execute engine of the E20 processor, shared by the simulator and the cache simulator
+from array import array
+from sim_helpers import *
+from sim_instruction import *
+from sim_predecode import *
+from sim_blocks import *
+
+def new_mem_array(size=8192):
+    """
+    Allocates zeroed memory, stored as one buffer of unsigned 16 bit cells
+    sig: int -> array(int)
+    """
+    return array("H",bytes(2*size))
+
+def new_reg_array(amount=8):
+    """
+    Allocates zeroed registers, stored as one buffer of unsigned 16 bit values
+    sig: int -> array(int)
+    """
+    return array("H",bytes(2*amount))
+
+## The interpreter loop is written once, here, and compiled into one function per set of
+## features, so a run only pays for the features it uses. The {stop} slot is filled in only by
+## the loops that stop before the instruction at stop_addr, and the {step} slot only by the
+## loops that call step_hook after every instruction.
+RUN_LOOP_SOURCE = """
+def {name}(machine,max_steps,stop_addr=None):
+    mem_array = machine.mem_array
+    reg_array = machine.reg_array
+    entries = machine.decoded.entries
+    blocks = machine.blocks
+    mem_hook = machine.mem_hook
+    step_hook = machine.step_hook
+    limit = -1 if max_steps is None else max_steps
+    pc = machine.pc
+    count = 0
+    while count != limit:
+        addr = pc & MASK13
+{stop}        instr = entries[addr]
+        if instr is None:
+            instr = predecode(mem_array[addr],addr)
+            entries[addr] = instr
+        name, handler, op1, op2, op3, halt, mem_access = instr
+
+        if halt:
+            machine.halted = True
+            break
+
+        if mem_access:
+            mem_num = effective_addr(reg_array[op1],op3)
+            if mem_hook is not None:
+                mem_hook(instr,pc,mem_num)
+            if name == "sw": #A store may overwrite code, so drop the decoding of the cell written to
+                entries[mem_num] = None
+                if blocks is not None:
+                    blocks.invalidate(mem_num)
+
+        next_pc = handler(op1,op2,op3,pc,mem_array,reg_array) & MASK16
+{step}        pc = next_pc
+        count += 1
+    machine.pc = pc
+    machine.steps += count
+    return count
+"""
+
+def compile_run_loop(name,step_hook=False,stop=False):
+    """
+    Compiles RUN_LOOP_SOURCE into a function name(machine, max_steps, stop_addr) that runs the machine,
+    calling its step_hook after every instruction if step_hook is true, and stopping before
+    the instruction at the 13 bit address stop_addr is executed if stop is true
+    sig: str -> bool -> bool -> function
+    """
+    step = "        step_hook(instr,pc,next_pc)\n" if step_hook else ""
+    stop = "        if addr == stop_addr:\n            break\n" if stop else ""
+    namespace = {"MASK13": MASK13, "MASK16": MASK16, "predecode": predecode, "effective_addr": effective_addr}
+    exec(compile(RUN_LOOP_SOURCE.format(name=name,step=step,stop=stop),"<%s>" % name,"exec"),namespace)
+    return namespace[name]
+
+run_loop = compile_run_loop("run_loop")
+run_loop_hooked = compile_run_loop("run_loop_hooked",step_hook=True)
+run_loop_to = compile_run_loop("run_loop_to",stop=True)
+run_loop_hooked_to = compile_run_loop("run_loop_hooked_to",step_hook=True,stop=True)
+
+class Machine:
+    """
+    An E20 machine together with the engine that executes it.
+    Every memory cell is decoded once into a DecodedInstr, so executing an instruction
+    is one lookup in the decode cache and one call of its handler.
+
+    Attributes:
+        mem_array (array(int)): The 8192 memory cells.
+        reg_array (array(int)): The 8 registers.
+        pc (int): The program counter.
+        decoded (DecodeCache): The decoded instruction of every memory cell.
+        blocks (BlockCache): The translated basic blocks, None until run_blocks is used.
+        mem_hook (function): Called as mem_hook(instr, pc, addr) before every lw and sw, or None.
+        step_hook (function): Called as step_hook(instr, pc, next_pc) after every instruction, or None.
+        halted (bool): If the machine has reached a halt instruction.
+        steps (int): The amount of instructions executed so far.
+    """
+    def __init__(self,mem_array=None,reg_array=None,pc=0):
+        if mem_array is None:
+            mem_array = new_mem_array()
+        if reg_array is None:
+            reg_array = new_reg_array()
+        self.mem_array = mem_array
+        self.reg_array = reg_array
+        self.pc = pc
+        self.decoded = DecodeCache(mem_array)
+        self.blocks = None
+        self.mem_hook = None
+        self.step_hook = None
+        self.halted = False
+        self.steps = 0
+
+    def copy(self):
+        """
+        Returns an independent copy of the machine state.
+        Copying the memory and registers is a single buffer copy each
+        sig: NoneType -> Machine
+        """
+        machine = Machine(self.mem_array[:],self.reg_array[:],self.pc)
+        machine.halted = self.halted
+        machine.steps = self.steps
+        return machine
+
+    def step(self):
+        """
+        Executes a single instruction.
+        Returns False if the machine is halted instead
+        sig: NoneType -> bool
+        """
+        return self.run(1) == 1
+
+    def run(self,max_steps=None):
+        """
+        Executes instructions until the halt instruction is reached, 
+        or until max_steps instructions have been executed if it is given.
+        Runs with a step_hook use the loop that calls it, so it costs nothing when it is None.
+        Returns the amount of instructions executed
+        sig: int -> int
+        """
+        if self.step_hook is not None:
+            return run_loop_hooked(self,max_steps)
+        return run_loop(self,max_steps)
+
+    def run_to(self,stop_pc,max_steps=None):
+        """
+        Executes like run, but stops before the instruction at stop_pc is executed,
+        also when the program wrote that instruction while running.
+        Returns the amount of instructions executed
+        sig: int -> int -> int
+        """
+        if self.step_hook is not None:
+            return run_loop_hooked_to(self,max_steps,stop_pc & MASK13)
+        return run_loop_to(self,max_steps,stop_pc & MASK13)
+
+    def run_blocks(self,max_steps=None):
+        """
+        Executes like run, but translates the straight-line basic blocks of the program 
+        into compiled functions and executes a whole block per call.
+        mem_hook and step_hook are not called in this mode.
+        Returns the amount of instructions executed
+        sig: int -> int
+        """
+        if self.blocks is None:
+            self.blocks = BlockCache(self.mem_array)
+        blocks = self.blocks
+        translated = blocks.blocks
+        mem_array = self.mem_array
+        reg_array = self.reg_array
+        entries = self.decoded.entries
+        pc = self.pc
+        count = 0
+        while True:
+            block = translated.get(pc & MASK13)
+            if block is None:
+                block = blocks.fetch(pc & MASK13)
+                if block is None:
+                    self.halted = True
+                    break
+            func, length, last_sw = block
+
+            if max_steps is not None and count + length > max_steps: #Finish instruction by instruction
+                self.pc = pc
+                self.steps += count
+                return count + self.run(max_steps - count)
+
+            pc = func(pc,mem_array,reg_array)
+            count += length
+
+            if last_sw is not None: #The block ended with a store, which may have overwritten code
+                mem_num = effective_addr(reg_array[last_sw.op1],last_sw.op3)
+                blocks.invalidate(mem_num)
+                entries[mem_num] = None
+        self.pc = pc
+        self.steps += count
+        return count
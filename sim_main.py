@@ -6,6 +6,11 @@ import argparse
 import math
 from sim_helpers import *
 from sim_instruction import *
+from sim_predecode import *
+from sim_machine import *
+from sim_image import *
+from sim_checkpoint import *
+from sim_profile import *
 # Some helpful constant values that we'll be using.
 Constants = namedtuple("Constants",["NUM_REGS", "MEM_SIZE", "REG_SIZE"])
 constants = Constants(NUM_REGS = 8,
@@ -36,25 +41,53 @@ def load_machine_code(machine_code, mem):
         expectedaddr += 1
         mem[addr] = instr
 
+def load_program(filename,mem,use_image=True):
+    """
+    Loads the E20 machine code file with the given name into mem, or an image written by sim_image.py.
+    The image of a machine code file is cached in image_cache_dir(), and read instead of parsing 
+    the file again as long as the file is unchanged, unless use_image is False.
+    Returns the amount of memory cells loaded
+    sig: str -> array(int) -> bool -> int
+    """
+    with open(filename,"rb") as file:
+        data = file.read()
+    if is_image(data):
+        count = read_image(filename,mem)
+        if count is None:
+            raise ValueError("Invalid program image: %s" % filename)
+        return count
+    if not use_image:
+        lines = data.decode().splitlines()
+        load_machine_code(lines,mem)
+        return len(lines)
+
+    digest = source_hash(data)
+    path = image_path(digest)
+    count = read_image(path,mem,digest)
+    if count is not None:
+        return count
+    lines = data.decode().splitlines()
+    load_machine_code(lines,mem)
+    try:
+        write_image(path,mem,len(lines),digest)
+    except OSError: #The cache is only an optimization, a read-only directory just goes without it
+        pass
+    return len(lines)
+
 def print_state(pc, regs, memory, memquantity):
     """
     Prints the current state of the simulator, including
     the current program counter, the current register values,
     and the first memquantity elements of memory.
-    sig: int -> list(int) -> list(int) - int -> NoneType
+    sig: int -> array(int) -> array(int) - int -> NoneType
     """
     print("Final state:")
     print("\tpc="+format(pc,"5d"))
     for reg, regval in enumerate(regs):
         print(("\t$%s=" % reg)+format(regval,"5d"))
-    line = ""
-    for count in range(memquantity):
-        line += format(memory[count], "04x")+ " "
-        if count % 8 == 7:
-            print(line)
-            line = ""
-    if line != "":
-        print(line)
+    for start in range(0,memquantity,8):
+        cells = memory[start:min(start+8,memquantity)]
+        print("".join([format(cell,"04x")+" " for cell in cells]))
 
 def exec_two_reg_instr(instr, mem_array, reg_array, pc):
     """
@@ -63,26 +96,9 @@ def exec_two_reg_instr(instr, mem_array, reg_array, pc):
     depending on the instruction executed. Returns the value of the program counter.
     sig: str -> list(int) -> list(int) -> int -> int
     """
-    curr_instruction = ""
-    prog_rg1 = 0
-    prog_rg2 = 0
-    imm = ""
     curr_instruction, prog_rg1, prog_rg2, imm = determine_two_reg_instruction(instr)
-    next_pc = pc
-    
-    if curr_instruction == "addi":
-        return addi(prog_rg1,prog_rg2,imm,next_pc,mem_array,reg_array)
-    elif curr_instruction == "jeq":
-        return jeq(prog_rg1,prog_rg2,imm,next_pc,mem_array,reg_array)
-    elif curr_instruction == "sw":
-        return sw(prog_rg1,prog_rg2,imm,next_pc,mem_array,reg_array)
-    elif curr_instruction == "lw":
-        return lw(prog_rg1,prog_rg2,imm,next_pc,mem_array,reg_array)
-    elif curr_instruction == "slti":
-        return slti(prog_rg1,prog_rg2,imm,next_pc,mem_array,reg_array)
-    elif curr_instruction == "undefined":
-        next_pc += 1
-        return next_pc
+    handler = HANDLERS[curr_instruction]
+    return handler(prog_rg1,prog_rg2,sign_extend(bin_to_dec(imm)),pc,mem_array,reg_array)
 
 def exec_three_reg_instr(instr,mem_array,reg_array,pc):
     """
@@ -91,28 +107,9 @@ def exec_three_reg_instr(instr,mem_array,reg_array,pc):
     depending on the instruction executed. Returns the value of the program counter.
     sig: str -> list(int) -> list(int) -> int -> int
     """
-    curr_instr = ""
-    prog_rg1 = 0
-    prog_rg2 = 0
-    prog_rg3 = 0
     curr_instr, prog_rg1, prog_rg2, prog_rg3 = determine_three_reg_instruction(instr)
-    next_pc = pc
-
-    if curr_instr == "add":
-        return add(prog_rg1,prog_rg2,prog_rg3,next_pc,mem_array,reg_array)
-    elif curr_instr == "sub":
-        return sub(prog_rg1,prog_rg2,prog_rg3,next_pc,mem_array,reg_array)
-    elif curr_instr == "or":
-        return orInstr(prog_rg1,prog_rg2,prog_rg3,next_pc,mem_array,reg_array)
-    elif curr_instr == "and":
-        return andInstr(prog_rg1,prog_rg2,prog_rg3,next_pc,mem_array,reg_array)
-    elif curr_instr == "slt":
-        return slt(prog_rg1,prog_rg2,prog_rg3,next_pc,mem_array,reg_array)
-    elif curr_instr == "jr":
-        return jr(prog_rg1,prog_rg2,prog_rg3,next_pc,mem_array,reg_array)
-    elif curr_instr == "undefined":
-        next_pc += 1
-        return next_pc
+    handler = HANDLERS[curr_instr]
+    return handler(prog_rg1,prog_rg2,prog_rg3,pc,mem_array,reg_array)
 
 def exec_zero_reg_instr(instr,mem_array,reg_array,pc):
     """
@@ -121,59 +118,57 @@ def exec_zero_reg_instr(instr,mem_array,reg_array,pc):
     depending on the instruction executed. Returns the value of the program counter.
     sig: str -> list(int) -> list(int) -> int -> int
     """
-    curr_instr = ""
-    imm = 0
-    next_pc = pc
     curr_instr, imm = determine_zero_reg_instruction(instr)
-    if curr_instr == "j":
-        return j(imm,next_pc)
-    elif curr_instr == "jal":
-        return jal(imm,next_pc,reg_array)
-    elif curr_instr == "undefined":
-        next_pc += 1
-        return next_pc
+    handler = HANDLERS[curr_instr]
+    return handler(imm,0,0,pc,mem_array,reg_array)
 
 def execute_instr(instr,mem_array,reg_array,pc):
     """
-    Handles which type of instruction we are executing 
-    and passes on the arguments to the correct function. 
+    Decodes the instruction and passes on the arguments to its handler in the dispatch table. 
     Returns the value of the program counter after the instruction.
     sig: str -> list(int) -> list(int) -> int -> int
     """
-    instr_type = determine_reg_amount(instr)
-    next_pc = pc
-    if instr_type == 3:
-        return exec_three_reg_instr(instr,mem_array,reg_array,next_pc)
-    elif instr_type == 2:
-        return exec_two_reg_instr(instr,mem_array,reg_array,next_pc)
-    else:
-        return exec_zero_reg_instr(instr,mem_array,reg_array,next_pc)
+    decoded = predecode(int(instr,2),pc & MASK13)
+    return decoded.handler(decoded.op1,decoded.op2,decoded.op3,pc,mem_array,reg_array)
 
 def main():
     parser = argparse.ArgumentParser(description='Simulate E20 machine')
     parser.add_argument('filename', help='The file containing machine code, typically with .bin suffix')
+    parser.add_argument('--blocks', action='store_true', help=
+        'Translate basic blocks into compiled Python functions for faster execution')
+    add_checkpoint_arguments(parser)
+    add_profile_arguments(parser)
+    add_image_arguments(parser)
     cmdline = parser.parse_args()
-    mem_array = [0]*8192
-    reg_array = [0]*8
-    pc = 0
+    if cmdline.profile is not None and cmdline.blocks:
+        parser.error("--profile can not be combined with --blocks, which runs whole blocks at once")
+    if cmdline.checkpoint is not None and cmdline.blocks:
+        parser.error("--checkpoint can not be combined with --blocks, which runs whole blocks at once")
+    check_checkpoint_arguments(parser,cmdline)
+    mem_array = new_mem_array(constants.MEM_SIZE)
+    reg_array = new_reg_array(constants.NUM_REGS)
 
-    with open(cmdline.filename) as file:
-        machine_code = file.readlines()
-        memory = load_machine_code(machine_code,mem_array) 
-
-    while True:
-        bit13_pc = bit16_to_bit13(pc)
-        curr_instr = bin_to_instruction(decimal_to_binary(mem_array[bit13_pc]))
-
-        if check_halt(curr_instr,bit13_pc):
-            break
-
-        pc = execute_instr(curr_instr,mem_array,reg_array,pc)
+    if cmdline.resume:
+        machine, _ = load_checkpoint(cmdline.filename,mem_array,reg_array)
+    else:
+        load_program(cmdline.filename,mem_array,cmdline.use_image)
+        machine = Machine(mem_array,reg_array)
+    profiler = None
+    if cmdline.profile is not None:
+        profiler = Profiler(mem_array)
+        machine.step_hook = profiler.step
 
-        if pc > 65535:
-            pc = pc - 65536
+    if cmdline.checkpoint is not None:
+        run_until(machine,cmdline.checkpoint_step,cmdline.checkpoint_pc)
+        save_checkpoint(cmdline.checkpoint,machine)
+    elif cmdline.blocks:
+        machine.run_blocks()
+    else:
+        machine.run()
 
-    print_state(pc,reg_array,mem_array,128)
+    print_state(machine.pc,reg_array,mem_array,128)
+    if profiler is not None:
+        print_profile(profiler,cmdline.profile,cmdline.profile_top)
 if __name__ == "__main__":
     main()
 #ra0Eequ6ucie6Jei0koh6phishohm9
\ No newline at end of file
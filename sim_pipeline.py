@@ -0,0 +1,203 @@
+#!/usr/bin/python3
+## Five stage pipeline model of the E20 processor (IF, ID, EX, MEM, WB).
+##
+## The program is executed by the usual engine, so the final state is exactly that of sim_main.py,
+## while the model follows the executed instructions through the pipeline and counts the cycles.
+## Registers are read in ID and written in WB, so without forwarding a result can be used 3 cycles
+## after the instruction producing it entered ID. With forwarding, results of the ALU are available
+## to the next instruction right away and the results of lw one cycle later (load-use stall).
+## j and jal know their target at the end of ID, flushing the instruction fetched after them.
+## jr and jeq are resolved in EX: jr always flushes 2 instructions, and jeq flushes 2 instructions
+## when it was mispredicted. A jeq predicted taken waits for its target from ID, costing 1 cycle.
+
+import argparse
+from sim_main import *
+from sim_machine import *
+from sim_predictors import *
+
+THREE_REG_ALU = ("add","sub","or","and","slt")
+
+def instr_registers(instr):
+    """
+    Returns the registers the instruction reads and the register it writes, None if it writes none.
+    Register 0 is left out, since it always reads 0 and writes to it are discarded
+    sig: DecodedInstr -> tuple[tuple(int), int]
+    """
+    name = instr.name
+    if name in THREE_REG_ALU:
+        sources, dest = (instr.op1,instr.op2), instr.op3
+    elif name == "jr":
+        sources, dest = (instr.op1,), None
+    elif name in ("addi","slti","lw"):
+        sources, dest = (instr.op1,), instr.op2
+    elif name in ("sw","jeq"):
+        sources, dest = (instr.op1,instr.op2), None
+    elif name == "jal":
+        sources, dest = (), 7
+    else:
+        sources, dest = (), None
+    return tuple(reg for reg in sources if reg != 0), (dest or None)
+
+class PipelineModel:
+    """
+    Counts the cycles of the executed instructions in a five stage pipeline.
+    Used as the step_hook of the Machine that executes the program.
+
+    Attributes:
+        forwarding (bool): If results are forwarded to the EX stage.
+        predictor (StaticPredictor|BimodalPredictor|GsharePredictor): Predicts the jeq instructions.
+        reg_array (array(int)): The registers of the machine, to find the outcome of jeq.
+        registers (dict[DecodedInstr,tuple]): The instr_registers of every instruction seen.
+        decode_cycle (int): The earliest cycle the next instruction can enter ID.
+        ready (list(int)): The earliest cycle an instruction reading each register can enter ID.
+        ready_from_lw (list(bool)): If the last write of each register is by a lw.
+        instructions (int): The amount of instructions executed.
+        last_decode (int): The cycle the last instruction entered ID.
+        data_stalls (int): Cycles waited for results of instructions other than lw.
+        load_use_stalls (int): Cycles waited for results of lw.
+        flushes (int): The amount of times fetched instructions were thrown away.
+        flush_cycles (int): The cycles lost to thrown away instructions.
+        branches (int): The amount of jeq executed.
+        mispredictions (int): The amount of jeq that were mispredicted.
+    """
+    def __init__(self,reg_array,forwarding=True,predictor=None):
+        self.forwarding = forwarding
+        self.predictor = StaticPredictor("not-taken") if predictor is None else predictor
+        self.reg_array = reg_array
+        self.registers = {}
+        self.decode_cycle = 1
+        self.ready = [0] * len(reg_array)
+        self.ready_from_lw = [False] * len(reg_array)
+        self.instructions = 0
+        self.last_decode = 0
+        self.data_stalls = 0
+        self.load_use_stalls = 0
+        self.flushes = 0
+        self.flush_cycles = 0
+        self.branches = 0
+        self.mispredictions = 0
+
+    def step(self,instr,pc,next_pc):
+        """
+        Follows one executed instruction through the pipeline
+        sig: DecodedInstr -> int -> int -> NoneType
+        """
+        registers = self.registers.get(instr)
+        if registers is None:
+            registers = instr_registers(instr)
+            self.registers[instr] = registers
+        sources, dest = registers
+        ready = self.ready
+
+        decode = self.decode_cycle
+        for reg in sources:
+            if ready[reg] > decode:
+                if self.ready_from_lw[reg]:
+                    self.load_use_stalls += ready[reg] - decode
+                else:
+                    self.data_stalls += ready[reg] - decode
+                decode = ready[reg]
+
+        if dest is not None:
+            name = instr.name
+            if not self.forwarding:
+                ready[dest] = decode + 3
+            elif name == "lw":
+                ready[dest] = decode + 2
+            else:
+                ready[dest] = decode + 1
+            self.ready_from_lw[dest] = name == "lw"
+
+        self.instructions += 1
+        self.last_decode = decode
+        self.decode_cycle = decode + 1 + self.control_penalty(instr,pc)
+
+    def control_penalty(self,instr,pc):
+        """
+        Returns the cycles lost to instructions fetched after instr that are thrown away,
+        and counts them as flushes
+        sig: DecodedInstr -> int -> int
+        """
+        name = instr.name
+        if name == "j" or name == "jal":
+            penalty = 1
+        elif name == "jr":
+            penalty = 2
+        elif name == "jeq":
+            target = (pc + 1 + instr.op3) & MASK16
+            taken = self.reg_array[instr.op1] == self.reg_array[instr.op2]
+            predicted = self.predictor.predict(pc,target)
+            self.predictor.update(pc,target,taken)
+            self.branches += 1
+            if predicted != taken:
+                self.mispredictions += 1
+                penalty = 2
+            elif taken:
+                penalty = 1
+            else:
+                penalty = 0
+        else:
+            return 0
+        if penalty:
+            self.flushes += 1
+            self.flush_cycles += penalty
+        return penalty
+
+    def cycles(self):
+        """
+        Returns the total amount of cycles, until the last instruction has left WB
+        sig: NoneType -> int
+        """
+        if self.instructions == 0:
+            return 0
+        return self.last_decode + 4
+
+    def report(self):
+        """
+        Returns the lines of the summary of the run
+        sig: NoneType -> list(str)
+        """
+        cycles = self.cycles()
+        cpi = cycles / self.instructions if self.instructions else 0.0
+        accuracy = 1 - self.mispredictions / self.branches if self.branches else 1.0
+        return ["instructions    %d" % self.instructions,
+                "cycles          %d" % cycles,
+                "data stalls     %d" % self.data_stalls,
+                "load-use stalls %d" % self.load_use_stalls,
+                "flushes         %d" % self.flushes,
+                "flush cycles    %d" % self.flush_cycles,
+                "branches        %d" % self.branches,
+                "mispredictions  %d" % self.mispredictions,
+                "accuracy        %.4f" % accuracy,
+                "CPI             %.4f" % cpi]
+
+def main():
+    parser = argparse.ArgumentParser(description='Simulate E20 machine on a five stage pipeline')
+    parser.add_argument('filename', help='The file containing machine code, typically with .bin suffix')
+    parser.add_argument('--no-forwarding', action='store_true', help=
+        'Do not forward results, so every instruction waits for the registers it reads to be written back')
+    parser.add_argument('--predictor', choices=PREDICTOR_NAMES, default='not-taken', help=
+        'How jeq is predicted: statically not taken, taken, backward taken, or by a table of 2 bit counters '
+        'indexed by the pc (bimodal) or by the pc and the last outcomes (gshare)')
+    parser.add_argument('--predictor-size', type=int, default=64, help=
+        'The amount of counters of the bimodal or gshare predictor')
+    parser.add_argument('--history-bits', type=int, default=8, help=
+        'The amount of outcomes the gshare predictor remembers')
+    add_image_arguments(parser)
+    cmdline = parser.parse_args()
+    mem_array = new_mem_array(constants.MEM_SIZE)
+    reg_array = new_reg_array(constants.NUM_REGS)
+
+    load_program(cmdline.filename,mem_array,cmdline.use_image)
+
+    machine = Machine(mem_array,reg_array)
+    predictor = make_predictor(cmdline.predictor,cmdline.predictor_size,cmdline.history_bits)
+    model = PipelineModel(reg_array,not cmdline.no_forwarding,predictor)
+    machine.step_hook = model.step
+    machine.run()
+
+    print_state(machine.pc,reg_array,mem_array,128)
+    print("\n".join(model.report()))
+
+if __name__ == "__main__":
+    main()
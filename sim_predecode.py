@@ -0,0 +1,103 @@
+## Predecoding of E20 instruction words into compact records that can be executed directly
+from collections import namedtuple
+from sim_helpers import *
+from sim_instruction import *
+
+# A decoded instruction. Executing it is a call to
+# handler(op1, op2, op3, next_pc, mem_array, reg_array).
+# Two register instructions use op1, op2 and the sign extended imm as op3,
+# three register instructions use the three register numbers and
+# zero register instructions keep their 13 bit imm in op1.
+# mem_access is set for lw and sw, whose address is reg_array[op1] + op3.
+DecodedInstr = namedtuple("DecodedInstr", ["name", "handler", "op1", "op2", "op3", "halt", "mem_access"])
+
+def exec_j(imm,unused1,unused2,next_pc,mem_array,reg_array):
+    """ 
+    Adapts the j instruction to the calling convention of decoded instructions
+    sig: int -> int -> int -> int -> list(int) -> list(int) -> int
+    """
+    return j(imm,next_pc)
+
+def exec_jal(imm,unused1,unused2,next_pc,mem_array,reg_array):
+    """ 
+    Adapts the jal instruction to the calling convention of decoded instructions
+    sig: int -> int -> int -> int -> list(int) -> list(int) -> int
+    """
+    return jal(imm,next_pc,reg_array)
+
+def exec_undefined(op1,op2,op3,next_pc,mem_array,reg_array):
+    """ 
+    Executes an undefined instruction, which only moves on to the next instruction
+    sig: int -> int -> int -> int -> list(int) -> list(int) -> int
+    """
+    return next_pc + 1
+
+# Dispatch table from (opcode, funct) to the name, handler and amount of registers of an instruction.
+# The funct is only part of the key for the three register instructions, for all other opcodes it is 0.
+INSTR_TABLE = {
+    (0,0): ("add",add,3),
+    (0,1): ("sub",sub,3),
+    (0,2): ("or",orInstr,3),
+    (0,3): ("and",andInstr,3),
+    (0,4): ("slt",slt,3),
+    (0,8): ("jr",jr,3),
+    (1,0): ("addi",addi,2),
+    (2,0): ("j",exec_j,0),
+    (3,0): ("jal",exec_jal,0),
+    (4,0): ("lw",lw,2),
+    (5,0): ("sw",sw,2),
+    (6,0): ("jeq",jeq,2),
+    (7,0): ("slti",slti,2),
+}
+UNDEFINED_ENTRY = ("undefined",exec_undefined,3)
+
+# The handlers by instruction name, as returned by the determine_*_instruction helpers
+HANDLERS = {name: handler for name, handler, reg_amount in INSTR_TABLE.values()}
+HANDLERS["undefined"] = exec_undefined
+
+def dispatch_key(word):
+    """ 
+    Determines the key of an instruction word in INSTR_TABLE
+    sig: int -> tuple[int,int]
+    """
+    opcode = opcode_bits(word)
+    if opcode == 0:
+        return (0,funct_bits(word))
+    return (opcode,0)
+
+def predecode(word,addr):
+    """ 
+    Decodes the instruction word stored at the 13 bit address addr into a DecodedInstr
+    sig: int -> int -> DecodedInstr
+    """
+    name, handler, reg_amount = INSTR_TABLE.get(dispatch_key(word),UNDEFINED_ENTRY)
+    if reg_amount == 3:
+        return DecodedInstr(name,handler,reg_a_bits(word),reg_b_bits(word),reg_c_bits(word),False,False)
+    elif reg_amount == 2:
+        return DecodedInstr(name,handler,reg_a_bits(word),reg_b_bits(word),sign_extend(imm7_bits(word)),
+                            False,name == "lw" or name == "sw")
+    else:
+        return DecodedInstr(name,handler,imm13_bits(word),0,0,is_halt_word(word,addr),False)
+
+class DecodeCache:
+    """
+    Caches the decoded instruction of every memory cell, so each word is only decoded once.
+    
+    Attributes:
+        mem_array (list(int)): The memory the instructions are decoded from.
+        entries (list(DecodedInstr)): The decoded instruction per address, None if not decoded yet.
+    """
+    def __init__(self,mem_array):
+        self.mem_array = mem_array
+        self.entries = [None]*len(mem_array)
+
+    def fetch(self,addr):
+        """
+        Returns the decoded instruction at the 13 bit address addr, decoding it on first use
+        sig: int -> DecodedInstr
+        """
+        instr = self.entries[addr]
+        if instr is None:
+            instr = predecode(self.mem_array[addr],addr)
+            self.entries[addr] = instr
+        return instr
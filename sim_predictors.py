@@ -0,0 +1,93 @@
+## Branch predictors for jeq.
+## A predictor is asked for a prediction with predict(pc, target) before the branch is resolved,
+## and told the outcome with update(pc, target, taken) afterwards.
+
+class StaticPredictor:
+    """
+    Predicts every branch the same way, or by its direction.
+
+    Attributes:
+        kind (str): "not-taken", "taken", or "backward" to predict backward branches taken.
+    """
+    def __init__(self,kind):
+        if kind not in ("not-taken","taken","backward"):
+            raise Exception("Unknown static predictor: %s" % kind)
+        self.kind = kind
+
+    def predict(self,pc,target):
+        if self.kind == "backward":
+            return target <= pc
+        return self.kind == "taken"
+
+    def update(self,pc,target,taken):
+        pass
+
+class BimodalPredictor:
+    """
+    A table of 2 bit saturating counters indexed by the pc of the branch.
+    Counters of 2 and 3 predict taken, all counters start at 1, weakly not taken.
+
+    Attributes:
+        counters (list(int)): The counter of every entry.
+    """
+    def __init__(self,size=64):
+        self.counters = [1] * size
+
+    def predict(self,pc,target):
+        return self.counters[pc % len(self.counters)] >= 2
+
+    def update(self,pc,target,taken):
+        counters = self.counters
+        index = pc % len(counters)
+        if taken:
+            if counters[index] < 3:
+                counters[index] += 1
+        elif counters[index] > 0:
+            counters[index] -= 1
+
+class GsharePredictor:
+    """
+    A table of 2 bit saturating counters indexed by the pc of the branch combined (xor)
+    with the outcomes of the last branches, so branches that depend on each other are
+    predicted by separate counters.
+
+    Attributes:
+        counters (list(int)): The counter of every entry.
+        history_bits (int): The amount of outcomes kept in history.
+        history (int): The last outcomes, the latest in the lowest bit, 1 for taken.
+    """
+    def __init__(self,size=256,history_bits=8):
+        self.counters = [1] * size
+        self.history_bits = history_bits
+        self.history = 0
+
+    def index(self,pc):
+        return (pc ^ self.history) % len(self.counters)
+
+    def predict(self,pc,target):
+        return self.counters[self.index(pc)] >= 2
+
+    def update(self,pc,target,taken):
+        counters = self.counters
+        index = self.index(pc)
+        if taken:
+            if counters[index] < 3:
+                counters[index] += 1
+        elif counters[index] > 0:
+            counters[index] -= 1
+        self.history = ((self.history << 1) | taken) & ((1 << self.history_bits) - 1)
+
+PREDICTOR_NAMES = ["not-taken","taken","backward","bimodal","gshare"]
+
+def make_predictor(name,size=64,history_bits=8):
+    """
+    Creates the predictor with the given name, one of PREDICTOR_NAMES. size is the amount
+    of entries of the table of a bimodal or gshare predictor, and history_bits the amount
+    of outcomes a gshare predictor remembers
+    sig: str -> int -> int -> StaticPredictor|BimodalPredictor|GsharePredictor
+    """
+    if name == "bimodal":
+        return BimodalPredictor(size)
+    if name == "gshare":
+        return GsharePredictor(size,history_bits)
+    return StaticPredictor(name)
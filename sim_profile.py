@@ -0,0 +1,148 @@
+## Execution profile of a program: where it spends its instructions.
+##
+## The Profiler is the step_hook of the Machine, which runs in a separate loop only when a
+## step_hook is set, so runs without a profile do not pay for it.
+## A dynamic basic block runs from the instruction a jump or taken branch went to up to and including
+## the next j, jal, jr or jeq. Every j or taken jeq to an address at or before its own is the back
+## edge of a loop, whose body is the code between the target and the jump. Returns with jr and
+## calls with jal are not loops, and neither is a jump to the halt instruction that ends the program.
+import json
+import sys
+from sim_helpers import *
+
+CONTROL = ("j","jal","jr","jeq")
+
+class Profiler:
+    """
+    Counts the instructions executed per pc, per instruction name, per dynamic basic block and per loop.
+
+    Attributes:
+        instructions (int): The amount of instructions executed.
+        pc_counts (dict[int,int]): The amount of times the instruction at every pc was executed.
+        mix (dict[str,int]): The amount of instructions executed per instruction name.
+        blocks (dict[tuple[int,int],int]): The amount of times every block, by its first and last pc, was executed.
+        loops (dict[tuple[int,int],int]): The amount of times every back edge, by the pc it goes to and its own pc, was taken.
+        block_start (int): The first pc of the block being executed, or None before the first instruction.
+        last_pc (int): The pc of the last instruction executed.
+        mem_array (array(int)): The memory of the machine, to recognize jumps to the halt instruction.
+    """
+    def __init__(self,mem_array):
+        self.instructions = 0
+        self.pc_counts = {}
+        self.mix = {}
+        self.blocks = {}
+        self.loops = {}
+        self.block_start = None
+        self.last_pc = None
+        self.mem_array = mem_array
+
+    def step(self,instr,pc,next_pc):
+        """
+        Counts one executed instruction, used as the step_hook of the Machine
+        sig: DecodedInstr -> int -> int -> NoneType
+        """
+        self.instructions += 1
+        self.pc_counts[pc] = self.pc_counts.get(pc,0) + 1
+        name = instr.name
+        self.mix[name] = self.mix.get(name,0) + 1
+        if self.block_start is None:
+            self.block_start = pc
+        self.last_pc = pc
+        if name in CONTROL or next_pc != (pc + 1) & MASK16:
+            block = (self.block_start,pc)
+            self.blocks[block] = self.blocks.get(block,0) + 1
+            self.block_start = next_pc
+            self.last_pc = None
+            if next_pc <= pc and (name == "j" or name == "jeq") and not self.halts(next_pc):
+                loop = (next_pc,pc)
+                self.loops[loop] = self.loops.get(loop,0) + 1
+
+    def halts(self,pc):
+        """
+        Checks if the instruction at pc is the halt instruction
+        sig: int -> bool
+        """
+        addr = pc & MASK13
+        return is_halt_word(self.mem_array[addr],addr)
+
+    def block_counts(self):
+        """
+        Returns the amount of times every block was executed, including the block the program halted in
+        sig: NoneType -> dict[tuple[int,int],int]
+        """
+        blocks = dict(self.blocks)
+        if self.last_pc is not None:
+            block = (self.block_start,self.last_pc)
+            blocks[block] = blocks.get(block,0) + 1
+        return blocks
+
+    def loop_instructions(self,head,tail):
+        """
+        Returns the amount of instructions executed in the body of the loop from head to tail
+        sig: int -> int -> int
+        """
+        return sum(count for pc, count in self.pc_counts.items() if head <= pc <= tail)
+
+    def as_dict(self):
+        """
+        Returns the profile as a dict that can be written as JSON
+        sig: NoneType -> dict
+        """
+        return {"instructions": self.instructions,
+                "mix": dict(sorted(self.mix.items())),
+                "pc_counts": {str(pc): count for pc, count in sorted(self.pc_counts.items())},
+                "blocks": [{"start": start, "end": end, "count": count, "instructions": count * (end - start + 1)}
+                           for (start, end), count in sorted(self.block_counts().items())],
+                "loops": [{"head": head, "tail": tail, "iterations": count,
+                           "instructions": self.loop_instructions(head,tail)}
+                          for (head, tail), count in sorted(self.loops.items())]}
+
+def percent(count,total):
+    return 100 * count / total if total else 0.0
+
+def profile_table(profiler,top=20):
+    """
+    Returns the lines of a readable profile: the instruction mix, and the top hottest pcs,
+    blocks by instructions executed and loops by iterations
+    sig: Profiler -> int -> list(str)
+    """
+    total = profiler.instructions
+    lines = ["instructions %d" % total, "instruction mix"]
+    for name, count in sorted(profiler.mix.items(),key=lambda item: (-item[1],item[0])):
+        lines.append("  %-10s %10d  %6.2f%%" % (name,count,percent(count,total)))
+    lines.append("hottest pcs")
+    for pc, count in sorted(profiler.pc_counts.items(),key=lambda item: (-item[1],item[0]))[:top]:
+        lines.append("  pc:%5d\tcount:%10d  %6.2f%%" % (pc,count,percent(count,total)))
+    lines.append("hottest blocks")
+    blocks = [(count * (end - start + 1),count,start,end) for (start, end), count in profiler.block_counts().items()]
+    for instructions, count, start, end in sorted(blocks,key=lambda item: (-item[0],item[2]))[:top]:
+        lines.append("  pc:%5d-%5d\tcount:%10d\tinstructions:%10d  %6.2f%%"
+                     % (start,end,count,instructions,percent(instructions,total)))
+    lines.append("hottest loops")
+    for (head, tail), count in sorted(profiler.loops.items(),key=lambda item: (-item[1],item[0]))[:top]:
+        instructions = profiler.loop_instructions(head,tail)
+        lines.append("  pc:%5d-%5d\titerations:%10d\tinstructions:%10d  %6.2f%%"
+                     % (head,tail,count,instructions,percent(instructions,total)))
+    return lines
+
+def print_profile(profiler,kind="table",top=20,stream=None):
+    """
+    Prints the profile as a table or, for kind "json", as a JSON object
+    sig: Profiler -> str -> int -> file -> NoneType
+    """
+    stream = sys.stdout if stream is None else stream
+    if kind == "json":
+        stream.write(json.dumps(profiler.as_dict()) + "\n")
+    else:
+        stream.write("\n".join(profile_table(profiler,top)) + "\n")
+
+def add_profile_arguments(parser):
+    """
+    Adds the command line options of the profiler to an ArgumentParser
+    sig: ArgumentParser -> NoneType
+    """
+    parser.add_argument('--profile', choices=['table','json'], help=
+        'Print the instructions executed per pc, per instruction, per basic block and per loop at the end, '
+        'as a table sorted by count or JSON')
+    parser.add_argument('--profile-top', type=int, default=20, help=
+        'The amount of pcs, blocks and loops in the profile table')
@@ -1,198 +1,743 @@
 #!/usr/bin/python3
 
-from collections import namedtuple
+from collections import namedtuple, OrderedDict
 import re
 import argparse
 from sim_helpers import *
 from sim_instruction import * 
 from sim_main import * 
+from sim_machine import *
 from simcache_helpers import * 
+from simcache_log import *
+from simcache_trace import *
+from simcache_stats import *
+from simcache_policy import *
+from simcache_timing import *
+from simcache_sample import *
 
-def associative_lw(name,cache,blockid,tag,row,pc,address,lru):
+def associative_lw(name,cache,blockid,tag,row,pc,address,lru,log=print_log_entry):
     """
     Takes info about the cache and calculates the result of a lw operation on an associative cache
-    Returns the result and prints the wanted cache update
-    sig: str -> list(list(CacheUnit)) -> int -> int -> int -> int -> int -> dict[int,int] ->  str
+    Returns the result and logs the wanted cache update with log, unless it is None
+    sig: str -> list(list(CacheUnit)) -> int -> int -> int -> int -> int -> list(OrderedDict[int,int]) -> function -> str
     """
     result = ""
-    unit = CacheUnit(blockid,tag)
-    blocks = find_blocks_in_row(cache,row)
-    if blockid in blocks: #HIT if the current block is in the row
+    if tag in lru[row]: #HIT if the current block is in the row
         result = "HIT"
-        update_lru(lru,blockid)
+        update_lru(lru,row,tag)
     else:
         result = "MISS"
-        if 0 in cache[row]: #Space left in row so add to non-full row 
-            insert_nonfull_assoc_cache(cache,row,unit)
-        else: #Full row, so evict and add to row 
-            insert_full_assoc_cache(cache,row,unit,lru)
-        update_lru(lru,blockid)
-    print_log_entry(name,result,pc,address,row)
+        insert_assoc_cache(cache,row,CacheUnit(blockid,tag),lru)
+    if log is not None:
+        log(name,result,pc,address,row)
     return result
 
-def direct_sw(name,cache,row,blockid,tag,pc,address):
+def direct_sw(name,cache,row,blockid,tag,pc,address,log=print_log_entry):
     """
     Updates the cache when a sw operation is performed on a direct cache
-    Prints the wanted cache update
-    sig: str -> list(list(CacheUnit)) -> int -> int -> int -> int -> int -> NoneType
+    Logs the wanted cache update with log, unless it is None
+    sig: str -> list(list(CacheUnit)) -> int -> int -> int -> int -> int -> function -> NoneType
     """
-    print_log_entry(name,"SW",pc,address,row)
-    unit = CacheUnit(blockid,tag)
-    cache[row] = unit
+    if log is not None:
+        log(name,"SW",pc,address,row)
+    cell = cache[row]
+    if not isinstance(cell,CacheUnit) or cell.block != blockid: #Only fill if the block is not cached yet
+        cache[row] = CacheUnit(blockid,tag)
 
-def associative_sw(name,cache,blockid,tag,pc,row,lru,address):
+def associative_sw(name,cache,blockid,tag,pc,row,lru,address,log=print_log_entry):
     """
     Updates the cache when a sw operation is performed on a associative cach
-    Prints the wanted cache update
+    Logs the wanted cache update with log, unless it is None
     Mostly passes on the data to other helper functions
-    sig: str -> list(list(CacheUnit)) -> int -> int -> int -> int -> dict[int,int] -> int -> NoneType
+    sig: str -> list(list(CacheUnit)) -> int -> int -> int -> int -> list(OrderedDict[int,int]) -> int -> function -> NoneType
     """
-    print_log_entry(name,"SW",pc,address,row)
-    unit = CacheUnit(blockid,tag)
-    if 0 in cache[row]: #Space left in row so add to non-full row
-        insert_nonfull_assoc_cache(cache,row,unit)
-    else: #Full row so we have to evict according to LRU and then add
-        insert_full_assoc_cache(cache,row,unit,lru)
-    update_lru(lru,blockid)
+    if log is not None:
+        log(name,"SW",pc,address,row)
+    if tag in lru[row]: #Block already cached, so it is only marked as used
+        update_lru(lru,row,tag)
+    else:
+        insert_assoc_cache(cache,row,CacheUnit(blockid,tag),lru)
 
-def cache_sw(name,cache,row,blockid,tag,pc,address,lru,assoc):
+def cache_sw(name,cache,row,blockid,tag,pc,address,lru,assoc,log=print_log_entry):
     """
     Passes on cache data to the correct function when doing a sw
     depending on if the cache is direct or associative
-    sig: str -> list(list(CacheUnit)) -> int -> int -> int -> int -> int -> dict[int,int] -> int -> NoneType
+    sig: str -> list(list(CacheUnit)) -> int -> int -> int -> int -> int -> list(OrderedDict[int,int]) -> int -> function -> NoneType
     """
     if assoc == 1:
-        direct_sw(name,cache,row,blockid,tag,pc,address)
+        direct_sw(name,cache,row,blockid,tag,pc,address,log)
     else: 
-        associative_sw(name,cache,blockid,tag,pc,row,lru,address)
+        associative_sw(name,cache,blockid,tag,pc,row,lru,address,log)
 
-def cache_lw(name,cache,blockid,tag,row,pc,address,lru,assoc):
+def cache_lw(name,cache,blockid,tag,row,pc,address,lru,assoc,log=print_log_entry):
     """
     Passes on cache data to the correct function when doing a lw
     depending on if the cache is direct or associative
     Returns the result
-    sig: str -> list(list(CacheUnit)) -> int -> int -> int -> int -> int -> dict[int,int] -> int -> str
+    sig: str -> list(list(CacheUnit)) -> int -> int -> int -> int -> int -> list(OrderedDict[int,int]) -> int -> function -> str
     """
     result = ""
     if assoc == 1:
-        result = direct_cache_lw(name,cache,blockid,tag,row,pc,address)
+        result = direct_cache_lw(name,cache,blockid,tag,row,pc,address,log)
     else:
-        result = associative_lw(name,cache,blockid,tag,row,pc,address,lru)
+        result = associative_lw(name,cache,blockid,tag,row,pc,address,lru,log)
     return result
 
-def cache_execution(name, cache, instr, pc, address, row, tag, blockid, assoc, lru):
+class CacheLevel:
+    """
+    One level of cache together with its configuration and contents.
+    
+    Attributes:
+        name (str): The name of the cache, "L1" or "L2".
+        size (int): The total size of the cache, measured in memory cells.
+        assoc (int): The associativity of the cache.
+        blocksize (int): The blocksize of the cache.
+        rows (int): The number of rows in the cache.
+        cache (list(list(CacheUnit))): The contents of every row.
+        lru (list(OrderedDict[int,int])): The tag index and LRU state of every row of the cache.
+        log (function): Called like print_log_entry for every cache event, or None to log nothing.
+        stats (CacheStats): Counts the accesses of the cache, or None to count nothing.
+    """
+    def __init__(self,name,size,assoc,blocksize,log=print_log_entry):
+        self.name = name
+        self.size = size
+        self.assoc = assoc
+        self.blocksize = blocksize
+        self.rows = num_rows(size,assoc,blocksize)
+        self.cache = [[0] * assoc for _ in range(self.rows)]
+        self.lru = new_lru(self.rows)
+        self.log = log
+        self.stats = None
+
+    def print_config(self):
+        print_cache_config(self.name,self.size,self.assoc,self.blocksize,self.rows)
+
+    def evicts(self,row,blockid,tag):
+        """
+        Checks if bringing the block into the cache now would remove another block from its row
+        sig: int -> int -> int -> bool
+        """
+        if self.assoc == 1:
+            cell = self.cache[row]
+            return isinstance(cell,CacheUnit) and cell.block != blockid
+        return tag not in self.lru[row] and len(self.lru[row]) == self.assoc
+
+    def lw(self,pc,addr):
+        """
+        Performs a lw of addr by the instruction at pc on the cache. Returns "HIT" or "MISS"
+        sig: int -> int -> str
+        """
+        blockid = addr // self.blocksize
+        row = blockid % self.rows
+        tag = blockid // self.rows
+        if self.stats is not None:
+            evicts = self.evicts(row,blockid,tag)
+            result = cache_lw(self.name,self.cache,blockid,tag,row,pc,addr,self.lru,self.assoc,self.log)
+            self.stats.record_lw(pc,addr,blockid,result == "HIT",evicts)
+            return result
+        return cache_lw(self.name,self.cache,blockid,tag,row,pc,addr,self.lru,self.assoc,self.log)
+
+    def sw(self,pc,addr):
+        """
+        Performs a sw of addr by the instruction at pc on the cache
+        sig: int -> int -> NoneType
+        """
+        blockid = addr // self.blocksize
+        row = blockid % self.rows
+        tag = blockid // self.rows
+        if self.stats is not None:
+            self.stats.record_sw(blockid,self.evicts(row,blockid,tag))
+        cache_sw(self.name,self.cache,row,blockid,tag,pc,addr,self.lru,self.assoc,self.log)
+
+    def get_state(self):
+        """
+        Returns the contents of the cache as a dict that can be written as JSON:
+        the tag and way of every block of every row, least recently used first
+        sig: NoneType -> dict
+        """
+        if self.assoc == 1: #Direct caches keep their block in the row itself
+            rows = [[[cell.tag,0]] if isinstance(cell,CacheUnit) else [] for cell in self.cache]
+        else:
+            rows = [list(map(list,ways.items())) for ways in self.lru]
+        return {"config": [self.size,self.assoc,self.blocksize], "rows": rows}
+
+    def set_state(self,state):
+        """
+        Replaces the contents of the cache with those returned by get_state
+        sig: dict -> NoneType
+        """
+        if state["config"] != [self.size,self.assoc,self.blocksize]:
+            raise Exception("Checkpoint does not match the configuration of %s" % self.name)
+        for row, blocks in enumerate(state["rows"]):
+            if self.assoc == 1:
+                self.cache[row] = CacheUnit(blocks[0][0] * self.rows + row,blocks[0][0]) if blocks else [0]
+                continue
+            self.cache[row] = [0] * self.assoc
+            self.lru[row] = OrderedDict()
+            for tag, way in blocks:
+                self.lru[row][tag] = way
+                self.cache[row][way] = CacheUnit(tag * self.rows + row,tag)
+
+class PolicyCacheLevel(CacheLevel):
+    """
+    One level of cache with a chosen replacement and write policy (see CachePolicy).
+    The CacheHierarchy it is part of decides which levels are accessed and filled, and is
+    told about every block the level evicts through on_evict.
+    Like the default caches, a sw that allocates a block does not read it from the next level.
+    
+    Attributes:
+        replacement (LRUReplacement|FIFOReplacement|RandomReplacement|PLRUReplacement): Chooses the blocks to evict.
+        write_back (bool): If a sw only marks its block dirty instead of writing through to the next level.
+        write_allocate (bool): If a sw of a block that is not cached brings it into the cache.
+        dirty (set(int)): The cached blocks that were written but not written back yet.
+        on_evict (function): Called as on_evict(level, pc, blockid, dirty) for every evicted block, or None.
+    """
+    def __init__(self,name,size,assoc,blocksize,log=print_log_entry,policy=DEFAULT_POLICY):
+        CacheLevel.__init__(self,name,size,assoc,blocksize,log)
+        self.replacement = make_replacement(policy,self.rows,assoc)
+        self.write_back = policy.write_back
+        self.write_allocate = policy.write_allocate
+        self.dirty = set()
+        self.on_evict = None
+
+    def holds(self,addr):
+        """
+        Checks if the block of addr is cached
+        sig: int -> bool
+        """
+        blockid = addr // self.blocksize
+        return blockid // self.rows in self.lru[blockid % self.rows]
+
+    def fill(self,pc,addr):
+        """
+        Brings the block of addr into its row during the instruction at pc. If the row is full 
+        the replacement policy chooses the block to evict, which is passed on to on_evict
+        sig: int -> int -> NoneType
+        """
+        blockid = addr // self.blocksize
+        row = blockid % self.rows
+        tag = blockid // self.rows
+        ways = self.lru[row]
+        if len(ways) < self.assoc:
+            used = set(ways.values()) #Blocks can be removed from any way, so the free ways have gaps
+            way = next(way for way in range(self.assoc) if way not in used)
+        else:
+            evicted = self.replacement.victim(row,ways)
+            way = ways.pop(evicted)
+            evicted_block = evicted * self.rows + row
+            dirty = evicted_block in self.dirty
+            self.dirty.discard(evicted_block)
+            if self.stats is not None:
+                self.stats.evictions += 1
+            if self.on_evict is not None:
+                self.on_evict(self,pc,evicted_block,dirty)
+        ways[tag] = way
+        self.cache[row][way] = CacheUnit(blockid,tag)
+        self.replacement.touch(row,ways,tag)
+
+    def remove(self,blockid):
+        """
+        Removes the block from the cache if it is cached, without evicting it. Returns if it was dirty
+        sig: int -> bool
+        """
+        row = blockid % self.rows
+        ways = self.lru[row]
+        way = ways.pop(blockid // self.rows,None)
+        if way is None:
+            return False
+        self.cache[row][way] = 0
+        dirty = blockid in self.dirty
+        self.dirty.discard(blockid)
+        return dirty
+
+    def lookup(self,pc,addr):
+        """
+        Looks up the block of a lw of addr by the instruction at pc, and logs and counts the result.
+        The block is not brought into the cache on a MISS. Returns "HIT" or "MISS"
+        sig: int -> int -> str
+        """
+        blockid = addr // self.blocksize
+        row = blockid % self.rows
+        tag = blockid // self.rows
+        ways = self.lru[row]
+        if tag in ways:
+            result = "HIT"
+            self.replacement.touch(row,ways,tag)
+        else:
+            result = "MISS"
+        if self.log is not None:
+            log = self.log
+            log(self.name,result,pc,addr,row)
+        if self.stats is not None:
+            self.stats.record_lw(pc,addr,blockid,result == "HIT",False)
+        return result
+
+    def write(self,pc,addr):
+        """
+        Performs a sw of addr by the instruction at pc on this level.
+        Returns if the write also goes on to the next level
+        sig: int -> int -> bool
+        """
+        blockid = addr // self.blocksize
+        row = blockid % self.rows
+        tag = blockid // self.rows
+        ways = self.lru[row]
+        cached = tag in ways
+        if self.log is not None:
+            log = self.log
+            log(self.name,"SW",pc,addr,row)
+        if self.stats is not None:
+            self.stats.record_sw(blockid,False)
+        if cached:
+            self.replacement.touch(row,ways,tag)
+        elif self.write_allocate:
+            self.fill(pc,addr)
+            cached = True
+        if self.write_back and cached:
+            self.dirty.add(blockid)
+            return False
+        return True
+
+    def get_state(self):
+        """
+        Returns the contents of the cache, its dirty blocks and the state of its replacement policy
+        as a dict that can be written as JSON
+        sig: NoneType -> dict
+        """
+        return {"config": [self.size,self.assoc,self.blocksize],
+                "rows": [list(map(list,ways.items())) for ways in self.lru],
+                "dirty": sorted(self.dirty), "replacement": self.replacement.get_state()}
+
+    def set_state(self,state):
+        """
+        Replaces the contents of the cache with those returned by get_state
+        sig: dict -> NoneType
+        """
+        if state["config"] != [self.size,self.assoc,self.blocksize]:
+            raise Exception("Checkpoint does not match the configuration of %s" % self.name)
+        for row, blocks in enumerate(state["rows"]):
+            self.cache[row] = [0] * self.assoc
+            self.lru[row] = OrderedDict()
+            for tag, way in blocks:
+                self.lru[row][tag] = way
+                self.cache[row][way] = CacheUnit(tag * self.rows + row,tag)
+        self.dirty = set(state["dirty"])
+        self.replacement.set_state(state["replacement"])
+
+class CacheHierarchy:
+    """
+    Any number of cache levels, L1 first. A lw goes down the levels until one of them hits,
+    and a sw goes down the levels as long as their write policy passes it on.
+    The inclusion policy decides where blocks are kept:
+    non-inclusive levels fill every level a lw missed and never look at each other's contents,
+    inclusive levels also remove a block from the levels above when it is evicted, and
+    exclusive levels keep every block in only one level: a lw brings its block into L1 only,
+    moving it out of the level that hit, and evicted blocks move down to the next level.
+    With the default policy and non-inclusive levels, plain CacheLevel objects are used.
+    
+    Attributes:
+        levels (list(CacheLevel)): The levels of cache, L1 first.
+        inclusion (str): "non-inclusive", "inclusive" or "exclusive".
+        policy (CachePolicy): The replacement and write policy of every level.
+        plain (bool): If the levels are plain CacheLevel objects.
+    """
+    def __init__(self,configs,log=print_log_entry,policy=DEFAULT_POLICY,inclusion="non-inclusive"):
+        names = ["L%d" % (number + 1) for number in range(len(configs))]
+        self.inclusion = inclusion
+        self.policy = policy
+        self.plain = policy[:3] == DEFAULT_POLICY[:3] and inclusion == "non-inclusive"
+        if self.plain:
+            self.levels = [CacheLevel(name,*config,log=log) for name, config in zip(names,configs)]
+            return
+        if inclusion not in ("non-inclusive","inclusive","exclusive"):
+            raise Exception("Unknown inclusion policy: %s" % inclusion)
+        if inclusion == "exclusive" and len(set(config[2] for config in configs)) > 1:
+            raise Exception("Exclusive caches need the same blocksize at every level")
+        if inclusion == "inclusive" and any(upper[2] > lower[2] for upper, lower in zip(configs,configs[1:])):
+            raise Exception("Inclusive caches need a blocksize at every level no larger than the level below")
+        self.levels = [PolicyCacheLevel(name,*config,log=log,policy=policy) for name, config in zip(names,configs)]
+        for level in self.levels:
+            level.on_evict = self.evicted
+
+    def print_config(self):
+        for level in self.levels:
+            level.print_config()
+
+    def get_state(self):
+        """
+        Returns the policies and contents of every level as a dict that can be written as JSON,
+        as stored in a checkpoint
+        sig: NoneType -> dict
+        """
+        return {"policy": list(self.policy), "inclusion": self.inclusion,
+                "levels": [level.get_state() for level in self.levels]}
+
+    def set_state(self,state):
+        """
+        Replaces the contents of every level with those returned by get_state
+        sig: dict -> NoneType
+        """
+        if len(state["levels"]) != len(self.levels):
+            raise Exception("Checkpoint does not match the amount of cache levels")
+        for level, level_state in zip(self.levels,state["levels"]):
+            level.set_state(level_state)
+
+    def lw(self,pc,addr):
+        """
+        Performs a lw of addr by the instruction at pc. Returns the result in L1, "HIT" or "MISS"
+        sig: int -> int -> str
+        """
+        levels = self.levels
+        if self.plain:
+            result = levels[0].lw(pc,addr)
+            if result == "MISS":
+                for level in levels[1:]:
+                    if level.lw(pc,addr) == "HIT": #Continue to the next level only if MISS
+                        break
+            return result
+
+        missed = 0
+        for level in levels:
+            if level.lookup(pc,addr) == "HIT":
+                break
+            missed += 1
+        if missed == 0:
+            return "HIT"
+        if self.inclusion == "exclusive":
+            dirty = missed < len(levels) and levels[missed].remove(addr // levels[missed].blocksize)
+            levels[0].fill(pc,addr)
+            if dirty:
+                levels[0].dirty.add(addr // levels[0].blocksize)
+        else:
+            for level in reversed(levels[:missed]): #The deepest level is filled first
+                level.fill(pc,addr)
+        return "MISS"
+
+    def sw(self,pc,addr):
+        """
+        Performs a sw of addr by the instruction at pc
+        sig: int -> int -> NoneType
+        """
+        if self.plain:
+            for level in self.levels:
+                level.sw(pc,addr)
+        else:
+            self.write_from(0,pc,addr)
+
+    def write_from(self,number,pc,addr):
+        """
+        Writes addr to the levels from the given level number on, as far as their write policy passes it on
+        sig: int -> int -> int -> NoneType
+        """
+        levels = self.levels
+        for number in range(number,len(levels)):
+            level = levels[number]
+            passes_on = level.write(pc,addr)
+            if self.inclusion == "exclusive" and level.holds(addr):
+                for lower in levels[number + 1:]: #The block now only lives in this level
+                    if lower.remove(addr // lower.blocksize) and level.write_back:
+                        level.dirty.add(addr // level.blocksize)
+                return
+            if self.inclusion == "inclusive" and level.holds(addr):
+                for lower in reversed(levels[number + 1:]): #Blocks of a level are also in every level below
+                    if not lower.holds(addr):
+                        lower.fill(pc,addr)
+            if not passes_on:
+                return
+
+    def evicted(self,level,pc,blockid,dirty):
+        """
+        Handles a block that was evicted from a level: removes it from the levels above
+        for inclusive caches, moves it to the next level for exclusive caches, and writes
+        it back to the next level or memory if it is dirty
+        sig: PolicyCacheLevel -> int -> int -> bool -> NoneType
+        """
+        levels = self.levels
+        number = levels.index(level)
+        addr = blockid * level.blocksize
+        if self.inclusion == "inclusive":
+            for upper in levels[:number]:
+                for upper_addr in range(addr,addr + level.blocksize,upper.blocksize):
+                    dirty = upper.remove(upper_addr // upper.blocksize) or dirty
+        elif self.inclusion == "exclusive" and number + 1 < len(levels):
+            lower = levels[number + 1]
+            if not lower.holds(addr):
+                lower.fill(pc,addr)
+            if dirty:
+                lower.dirty.add(blockid)
+            return
+        if dirty:
+            if level.stats is not None:
+                level.stats.writebacks += 1
+            if number + 1 < len(levels):
+                self.write_from(number + 1,pc,addr)
+
+def add_stats(caches):
+    """
+    Makes every cache count its accesses in its stats attribute
+    sig: list(CacheLevel) -> NoneType
+    """
+    for level in caches:
+        level.stats = CacheStats(level.name,level.size,level.blocksize)
+
+def parse_cache_config(cache_config):
+    """
+    Splits the argument of --cache, groups of size,associativity,blocksize with one group 
+    per level of cache, into one [size, assoc, blocksize] list per level
+    sig: str -> list(list(int))
+    """
+    parts = cache_config.split(",")
+    if len(parts) == 0 or len(parts) % 3 != 0:
+        raise Exception("Invalid cache config")
+    return [[int(x) for x in parts[i:i + 3]] for i in range(0,len(parts),3)]
+
+def checkpoint_caches(cache_state):
+    """
+    Returns the cache configuration, as given to --cache, the policy and the inclusion policy
+    of the caches stored in a checkpoint
+    sig: dict -> tuple[str, CachePolicy, str]
+    """
+    configs = [level["config"] for level in cache_state["levels"]]
+    cache_config = ",".join(str(x) for config in configs for x in config)
+    return cache_config, CachePolicy(*cache_state["policy"]), cache_state["inclusion"]
+
+def make_cache_hierarchy(cache_config,log=print_log_entry,stats=False,policy=DEFAULT_POLICY,inclusion="non-inclusive"):
+    """
+    Creates the cache hierarchy described by cache_config, as given to --cache,
+    and prints its configuration. Every cache event is logged with log.
+    If stats is true, the caches also count their accesses (see CacheStats).
+    policy chooses the replacement and write policy of every cache and inclusion
+    how the levels share blocks (see CacheHierarchy)
+    sig: str -> function -> bool -> CachePolicy -> str -> CacheHierarchy
     """
-    Determines what kind of cache instruction we are dealing wth an passes on the data 
-    sig: str -> list(list(CacheUnit)) -> str -> int -> int -> int -> int -> int -> int -> dict[int,int] -> NoneType
+    hierarchy = CacheHierarchy(parse_cache_config(cache_config),log,policy,inclusion)
+    hierarchy.print_config()
+    if stats:
+        add_stats(hierarchy.levels)
+    return hierarchy
+
+def hierarchy_access(hierarchy):
     """
-    type = instr[0:3] #Determine if we are dealing with lw or sw 
-    if type == "100": #LW
-        cache_lw(name,cache,blockid,tag,row,pc,address,lru,assoc)
-    elif type == "101": #SW
-        cache_sw(name,cache,row,blockid,tag,pc,address,lru,assoc)
+    Returns a function cache_access(op, pc, addr) that passes one lw or sw through the hierarchy
+    sig: CacheHierarchy -> function
+    """
+    lw = hierarchy.lw
+    sw = hierarchy.sw
+    def cache_access(op,pc,addr):
+        if op == "lw":
+            lw(pc,addr)
+        else:
+            sw(pc,addr)
+    return cache_access
 
-def multi_cache_execution(instr,L1info,L2info,pc,lru1,lru2,address):
+def make_cache_access(cache_config,log=print_log_entry,stats=False,policy=DEFAULT_POLICY,inclusion="non-inclusive"):
     """
-    Determines what kind of cache instruction we are dealing wth an passes on the data when we have multiple caches
-    sig: str -> tuple[list[list[CacheUnit]], int, int, int, int] -> tuple[list[list[CacheUnit]], int, int, int, int] -> int -> dict[int, int] -> dict[int, int] -> int -> NoneType
+    Creates the cache hierarchy described by cache_config like make_cache_hierarchy.
+    Returns the caches and a function cache_access(op, pc, addr) that passes one lw or sw through them
+    sig: str -> function -> bool -> CachePolicy -> str -> tuple[list(CacheLevel), function]
     """
-    type = instr[0:3] #Determine if we are dealing with lw or sw 
-    L1cache,L1blockid,L1row,L1tag,L1assoc = L1info #Extract cache info
-    L2cache,L2blockid,L2row,L2tag,L2assoc = L2info #Extract cache info
-    if type == "100": #LW
-        result = ""
-        result = cache_lw("L1",L1cache,L1blockid,L1tag,L1row,pc,address,lru1,L1assoc)
-        if result == "MISS": #Continue to L2 cache if MISS in L1 cache
-            cache_lw("L2",L2cache,L2blockid,L2tag,L2row,pc,address,lru2,L2assoc)
-    elif type == "101": #SW
-        cache_sw("L1",L1cache,L1row,L1blockid,L1tag,pc,address,lru1,L1assoc)
-        cache_sw("L2",L2cache,L2row,L2blockid,L2tag,pc,address,lru2,L2assoc)
+    hierarchy = make_cache_hierarchy(cache_config,log,stats,policy,inclusion)
+    return hierarchy.levels, hierarchy_access(hierarchy)
 
+def simulate_cache(mem_array,reg_array,cache_config,max_steps=None,log_kind="text",log_file=None,trace=None,stats_kind=None,policy=DEFAULT_POLICY,inclusion="non-inclusive",
+                   timing=None,machine=None,cache_state=None,checkpoint=None,checkpoint_step=None,checkpoint_pc=None):
+    """
+    Runs the loaded program while simulating the caches described by cache_config,
+    comma separated integers as given to --cache.
+    Prints the cache configuration and passes every cache event to a log sink
+    of the given kind (see make_log_sink), written to log_file or the standard output.
+    If trace is given, every lw and sw is also recorded with it (see TraceWriter).
+    If stats_kind is "table" or "json", the statistics of every cache are printed at the end.
+    policy chooses the replacement and write policy of the caches and inclusion how they share blocks.
+    If timing is given, it counts the cycles of the run and its report is printed at the end.
+    Stops after max_steps instructions if it is given. 
+    A machine and the contents of the caches restored from a checkpoint can be given to continue
+    their run. If checkpoint is given, the run stops at checkpoint_step or checkpoint_pc as for
+    run_until, and the state of the machine and caches is written to that file.
+    Returns the machine that was run
+    sig: array(int) -> array(int) -> str -> int -> str -> str -> TraceWriter -> str -> CachePolicy -> str -> TimingModel -> Machine -> dict -> str -> int -> int -> Machine
+    """
+    if machine is None:
+        machine = Machine(mem_array,reg_array)
+    log = make_log_sink(log_kind,log_file)
+    if timing is not None: #The timing model sees every cache event before the log does
+        timing.log = log
+        log = timing
+    hierarchy = make_cache_hierarchy(cache_config,log,stats_kind is not None,policy,inclusion)
+    if cache_state is not None:
+        hierarchy.set_state(cache_state)
+    caches = hierarchy.levels
+    cache_access = hierarchy_access(hierarchy)
+    if timing is not None:
+        timing.levels = len(caches)
+        machine.step_hook = timing.step
+
+    if trace is None:
+        def mem_hook(instr,pc,addr):
+            cache_access(instr.name,pc,addr)
+    else:
+        def mem_hook(instr,pc,addr):
+            trace.write(instr.name,pc,addr)
+            cache_access(instr.name,pc,addr)
+
+    machine.mem_hook = mem_hook #Every lw and sw is passed on to the cache before it executes
+    try:
+        if checkpoint is not None:
+            run_until(machine,checkpoint_step,checkpoint_pc)
+            save_checkpoint(checkpoint,machine,hierarchy.get_state())
+        else:
+            machine.run(max_steps)
+    finally:
+        if log is not None:
+            log.close()
+    if stats_kind is not None:
+        print_stats([level.stats for level in caches],stats_kind)
+    if timing is not None:
+        print("\n".join(timing.report()))
+    return machine
+
+def simulate_sampled(mem_array,reg_array,cache_config,plan=DEFAULT_PLAN,policy=DEFAULT_POLICY,inclusion="non-inclusive",
+                     confidence=0.95,machine=None,cache_state=None):
+    """
+    Runs the loaded program while simulating the caches described by cache_config only in the
+    windows of the sampling plan (see SamplePlan). The rest of the program is executed by the fast
+    engine. Prints the cache configuration and, at the end, the estimated miss ratio and misses of
+    every cache with their confidence intervals. A machine and the contents of the caches restored
+    from a checkpoint can be given to continue their run. Returns the machine that was run and the samples
+    sig: array(int) -> array(int) -> str -> SamplePlan -> CachePolicy -> str -> float -> Machine -> dict -> tuple[Machine, list(Sample)]
+    """
+    check_plan(plan)
+    if machine is None:
+        machine = Machine(mem_array,reg_array)
+    counter = SampleCounter()
+    hierarchy = make_cache_hierarchy(cache_config,None,False,policy,inclusion)
+    if cache_state is not None:
+        hierarchy.set_state(cache_state)
+    cache_access = hierarchy_access(hierarchy)
+    def mem_hook(instr,pc,addr):
+        cache_access(instr.name,pc,addr)
+
+    start = machine.steps
+    samples = []
+    while not machine.halted:
+        machine.mem_hook = None
+        machine.run_blocks(plan.period - plan.warmup - plan.measure)
+        machine.mem_hook = mem_hook
+        machine.run(plan.warmup)
+        for level in hierarchy.levels: #Only the measurement window is counted
+            level.log = counter
+        executed = machine.run(plan.measure)
+        for level in hierarchy.levels:
+            level.log = None
+        if executed:
+            samples.append(Sample(executed,counter.take()))
+    machine.mem_hook = None
+
+    instructions = machine.steps - start
+    if samples:
+        names = [level.name for level in hierarchy.levels]
+        estimates = estimate(samples,names,instructions,confidence)
+        print("\n".join(sample_report(estimates,instructions,sum(sample.instructions for sample in samples),confidence)))
+    else:
+        print("instructions %d, no samples: the program halted before the first window, use a shorter --period" % instructions)
+    return machine, samples
+
+def simulate_memory(mem_array,reg_array,max_steps=None,trace=None,timing=None,machine=None):
+    """
+    Runs the loaded program without caches. Every lw and sw is recorded with trace
+    and the cycles are counted with timing, if they are given, and the timing report 
+    is printed at the end. Stops after max_steps instructions if it is given. 
+    A machine restored from a checkpoint can be given to continue its run.
+    Returns the machine that was run
+    sig: array(int) -> array(int) -> int -> TraceWriter -> TimingModel -> Machine -> Machine
+    """
+    if machine is None:
+        machine = Machine(mem_array,reg_array)
+
+    def mem_hook(instr,pc,addr):
+        if trace is not None:
+            trace.write(instr.name,pc,addr)
+        if timing is not None:
+            timing.memory_access(instr,pc,addr)
+
+    machine.mem_hook = mem_hook
+    if timing is not None:
+        machine.step_hook = timing.step
+    machine.run(max_steps)
+    if timing is not None:
+        print("\n".join(timing.report()))
+    return machine
 
 def main():
     parser = argparse.ArgumentParser(description='Simulate E20 cache')
     parser.add_argument('filename', help=
         'The file containing machine code, typically with .bin suffix')
     parser.add_argument('--cache', help=
-        'Cache configuration: size,associativity,blocksize (for one cache) '
-        'or size,associativity,blocksize,size,associativity,blocksize (for two caches)')
+        'Cache configuration: size,associativity,blocksize for every level of cache, L1 first, '
+        'for example size,associativity,blocksize,size,associativity,blocksize for two caches')
+    parser.add_argument('--log', choices=['text','binary','counts','none'], help=
+        'How cache events are logged: the usual text lines (the default), fixed size binary records, '
+        'only the amount of events per cache and kind, or not at all')
+    parser.add_argument('--log-file', help=
+        'The file the log is written to instead of the standard output')
+    parser.add_argument('--record-trace', help=
+        'Record every lw and sw to this file, which simcache_trace.py can replay without running the program')
+    parser.add_argument('--stats', choices=['table','json'], help=
+        'Print the reads, writes, hits, misses, evictions and kinds of misses of every cache '
+        'and its misses per pc and memory region at the end, as a table or JSON')
+    add_policy_arguments(parser)
+    add_timing_arguments(parser)
+    add_checkpoint_arguments(parser)
+    add_sample_arguments(parser)
+    add_image_arguments(parser)
     cmdline = parser.parse_args()
-    mem_array = [0]*8192
-    reg_array = [0]*8
-    pc = 0
-
-    with open(cmdline.filename) as file:
-        machine_code = file.readlines()
-        load_machine_code(machine_code,mem_array) 
-
-    if cmdline.cache is not None:
-        parts = cmdline.cache.split(",")
-        if len(parts) == 3:
-            [L1size, L1assoc, L1blocksize] = [int(x) for x in parts]
-            rows = num_rows(L1size,L1assoc,L1blocksize)
-            L1cache = [[0] * L1assoc for _ in range(rows)] #Initialize L1 cache
-            lru = {} #Initialize lru
-            print_cache_config("L1", L1size, L1assoc, L1blocksize,rows)
-
-            while True:
-                bit13_pc = bit16_to_bit13(pc)
-                curr_instr = bin_to_instruction(decimal_to_binary(mem_array[bit13_pc]))
-                
-                if check_halt(curr_instr,bit13_pc):
-                    break
-                    
-                if check_cache_instr(curr_instr):
-                    addr = address(curr_instr,reg_array)
-                    blockid = addr // L1blocksize
-                    row = blockid % rows
-                    tag = blockid // rows
-                    cache_execution("L1",L1cache,curr_instr,pc,addr,row,tag,blockid,L1assoc,lru)
-                    
-                pc = execute_instr(curr_instr,mem_array,reg_array,pc)
-
-                if pc > 65535:
-                    pc = pc - 65536
-            
-        elif len(parts) == 6:
-            [L1size, L1assoc, L1blocksize, L2size, L2assoc, L2blocksize] = \
-                [int(x) for x in parts]
-            L1rows = num_rows(L1size,L1assoc,L1blocksize)
-            L2rows = num_rows(L2size,L2assoc,L2blocksize)
-
-            L1cache = [[0] * L1assoc for _ in range(L1rows)] #Initialize L1 cache
-            L2cache = [[0] * L2assoc for _ in range(L2rows)] #Initialize L2 cache
-            lru_L1 = {} #Initialize lru 1
-            lru_L2 = {} #Initialize lru 2
-
-            print_cache_config("L1", L1size, L1assoc, L1blocksize,L1rows)
-            print_cache_config("L2", L2size, L2assoc, L2blocksize,L2rows)
-
-            while True:
-                bit13_pc = bit16_to_bit13(pc)
-                curr_instr = bin_to_instruction(decimal_to_binary(mem_array[bit13_pc]))
-
-                if check_halt(curr_instr,bit13_pc):
-                    break
-                
-                if check_cache_instr(curr_instr):
-                    addr = address(curr_instr,reg_array)
-                    L1blockid = addr // L1blocksize
-                    L2blockid = addr // L2blocksize
-                    L1row = L1blockid % L1rows
-                    L1tag = L1blockid // L1rows
-                    L2row = L2blockid % L2rows
-                    L2tag = L2blockid // L2rows
-                    L1info = [L1cache,L1blockid,L1row,L1tag,L1assoc]
-                    L2info = [L2cache,L2blockid,L2row,L2tag,L2assoc]
-                    multi_cache_execution(curr_instr,L1info,L2info,pc,lru_L1,lru_L2,addr)
-                    
-
-                pc = execute_instr(curr_instr,mem_array,reg_array,pc)
-
-                if pc > 65535:
-                    pc = pc - 65536
-        else:
-            raise Exception("Invalid cache config")
+    check_checkpoint_arguments(parser,cmdline)
+    mem_array = new_mem_array(constants.MEM_SIZE)
+    reg_array = new_reg_array(constants.NUM_REGS)
+    machine = None
+    cache_state = None
+    cache_config = cmdline.cache
+    policy = policy_from_args(cmdline)
+    inclusion = inclusion_from_args(cmdline)
+    if cmdline.resume:
+        machine, cache_state = load_checkpoint(cmdline.filename,mem_array,reg_array)
+        if cache_state is not None: #Caches continue as they were, a checkpoint without caches starts them cold
+            if cache_config is not None:
+                parser.error("the checkpoint already holds the caches, --cache can not be given")
+            for option in given_policy_options(cmdline):
+                parser.error("the checkpoint already holds the cache policies, %s can not be given" % option)
+            cache_config, policy, inclusion = checkpoint_caches(cache_state)
+    else:
+        load_program(cmdline.filename,mem_array,cmdline.use_image)
+    if cmdline.checkpoint is not None and cache_config is None:
+        parser.error("--checkpoint needs --cache, sim_main.py writes checkpoints without caches")
+    plan = plan_from_args(parser,cmdline)
+    if plan is not None:
+        if cache_config is None:
+            parser.error("--sample needs --cache")
+        for option, value in (("--checkpoint",cmdline.checkpoint),("--record-trace",cmdline.record_trace),
+                              ("--stats",cmdline.stats),("--timing",cmdline.timing or None),
+                              ("--log",cmdline.log),("--log-file",cmdline.log_file)):
+            if value is not None: #Sampled runs only print their estimates
+                parser.error("%s can not be combined with --sample" % option)
+
+    trace = None
+    if cmdline.record_trace is not None:
+        trace = TraceWriter(cmdline.record_trace)
+
+    if plan is not None:
+        simulate_sampled(mem_array,reg_array,cache_config,plan,policy,inclusion,
+                         cmdline.confidence,machine=machine,cache_state=cache_state)
+    elif cache_config is not None:
+        simulate_cache(mem_array,reg_array,cache_config,log_kind=cmdline.log or "text",log_file=cmdline.log_file,
+                       trace=trace,stats_kind=cmdline.stats,policy=policy,inclusion=inclusion,
+                       timing=timing_from_args(cmdline),machine=machine,cache_state=cache_state,
+                       checkpoint=cmdline.checkpoint,checkpoint_step=cmdline.checkpoint_step,
+                       checkpoint_pc=cmdline.checkpoint_pc)
+    elif trace is not None or cmdline.timing:
+        simulate_memory(mem_array,reg_array,trace=trace,timing=timing_from_args(cmdline),machine=machine)
+    if trace is not None:
+        trace.close()
 
 if __name__ == "__main__":
     main()
@@ -1,3 +1,4 @@
+from collections import OrderedDict
 from sim_helpers import *
 from sim_instruction import * 
 from sim_main import * 
@@ -9,7 +10,11 @@ class CacheUnit:
     Attributes:
         block (int): The memory block stored in this cache unit.
         tag (int): The tag used for identifying the cache block.
+    Units are only created when a block is filled into the cache, and
+    use __slots__ so they carry no per-instance __dict__.
     """
+    __slots__ = ("block","tag")
+
     def __init__(self,block,tag):
         self.block = block
         self.tag = tag
@@ -42,10 +47,14 @@ def address(instr,reg):
     Determines the address we want to get or insert into cache
     sig: str -> list(int) -> int
     """
-    prog_reg1 = bin_to_dec(instr[3:6])
-    imm = instr[9:]
-    addr = mem_addr(reg[prog_reg1],imm)
-    return addr
+    return word_address(int(instr,2),reg)
+
+def word_address(word,reg):
+    """
+    Determines the address we want to get or insert into cache directly from the instruction word
+    sig: int -> list(int) -> int
+    """
+    return effective_addr(reg[reg_a_bits(word)],sign_extend(imm7_bits(word)))
 
 def print_cache_config(cache_name, size, assoc, blocksize, num_rows):
     """
@@ -102,70 +111,78 @@ def num_rows(size,assoc,bsize):
     """
     return int(size / (assoc*bsize))
 
-def direct_cache_lw(name,cache,blockid,tag,row,pc,address):
+def direct_cache_lw(name,cache,blockid,tag,row,pc,address,log=print_log_entry):
     """
     Takes info about the cache and calculates the result of a lw operation on a direct cache
-    Returns the result and prints the wanted cache update
-    sig: str -> list(list(CacheUnit)) -> int -> int -> int -> int -> int -> str -> NoneType
+    Returns the result and logs the wanted cache update with log, unless it is None
+    sig: str -> list(list(CacheUnit)) -> int -> int -> int -> int -> int -> function -> str
     """
     result = ""
-    unit = CacheUnit(blockid,tag)
-    if cache[row] == [0]: #Miss if row is empty     
-        cache[row] = unit
+    cell = cache[row]
+    if not isinstance(cell,CacheUnit): #Miss if row is empty, i.e. still the initial [0]
+        cache[row] = CacheUnit(blockid,tag)
         result = "MISS"
-    elif cache[row].get_block() == blockid: #Hit if correct block in row
+    elif cell.block == blockid: #Hit if correct block in row
         result = "HIT"
-    elif cache[row].get_block() != blockid: #Miss and update if wrong block in row
+    else: #Miss and update if wrong block in row
         result = "MISS"
-        cache[row] = unit
-    print_log_entry(name,result,pc,address,row)
+        cache[row] = CacheUnit(blockid,tag)
+    if log is not None:
+        log(name,result,pc,address,row)
     return result
 
-def find_blocks_in_row(cache,row):
+def new_lru(rows):
+    """
+    Creates the LRU state of a cache with the given number of rows.
+    Every row has its own OrderedDict mapping the tag of each block in the row 
+    to the way it is stored in, ordered from least to most recently used.
+    It is both the tag index and the recency order of the row
+    sig: int -> list(OrderedDict[int,int])
+    """
+    return [OrderedDict() for _ in range(rows)]
+
+def free_ways(cache,row,lru):
     """
-    Helper function to find the different blocks that are stored in a cache row
-    sig: list(list(CacheUnit)) -> int -> list(int)
+    Returns the number of empty ways left in a cache row
+    sig: list(list(CacheUnit)) -> int -> list(OrderedDict[int,int]) -> int
     """
-    blocks = []
-    for cell in cache[row]: #Iterates through the row and adds the different blocks to a list
-        if cell == 0:
-            continue
-        else:
-            blocks.append(cell.get_block())
-    return blocks
+    return len(cache[row]) - len(lru[row])
 
-def insert_nonfull_assoc_cache(cache,row,unit):
+def insert_nonfull_assoc_cache(cache,row,unit,lru):
     """
     Helper function to add to a non-full cache with associativity greater than 1.
-    The new CacheUnit is added to the first open spot
-    sig: list(list(CacheUnit)) -> int -> CacheUnit -> NoneType
+    The new CacheUnit is added to the first open spot. Ways are filled in order and 
+    never emptied again, so the first open spot is the number of blocks in the row
+    sig: list(list(CacheUnit)) -> int -> CacheUnit -> list(OrderedDict[int,int]) -> NoneType
     """
-    for idx, cell in enumerate(cache[row]):
-        if cell == 0:
-            cache[row][idx] = unit
-            break
+    way = len(lru[row])
+    cache[row][way] = unit
+    lru[row][unit.get_tag()] = way
 
 def insert_full_assoc_cache(cache,row,unit,lru):
     """
     Inserts into a cache with associativity graeter than 1, when the row is full. 
-    Uses and updated the LRU
-    sig: list(list(CacheUnit)) -> int -> CacheUnit -> dict[int,int] -> NoneType
-    """
-    max_val  = 0
-    max_cell_idx = 0
-    for idx, cell in enumerate(cache[row]): #Loop to find the cell in the row to evict using te LRU
-        cell_lru = lru[cell.get_block()]
-        if cell_lru > max_val:
-            max_val = cell_lru
-            max_cell_idx = idx 
-    del lru[cache[row][max_cell_idx].get_block()] #Deletes the block that is no longer in the cache fro the LRU
-    cache[row][max_cell_idx] = unit #Adds the new CacheUnit to the cache where the previous block was evected from
-
-def update_lru(lru,blockid):
-    """
-    Updates the lru after a cache operation
-    sig: dict[int,int] -> int -> NoneType
-    """
-    for block in lru: #Increments the value of all blocks by 1
-        lru[block] += 1
-    lru[blockid] = 0 #Sets the lru value of the block currently used to 0 
+    Evicts the least recently used block of the row and removes it from the LRU
+    sig: list(list(CacheUnit)) -> int -> CacheUnit -> list(OrderedDict[int,int]) -> NoneType
+    """
+    victim_tag, way = lru[row].popitem(last=False) #The least recently used block of the row comes first
+    cache[row][way] = unit #Adds the new CacheUnit to the cache where the previous block was evected from
+    lru[row][unit.get_tag()] = way
+
+def insert_assoc_cache(cache,row,unit,lru):
+    """
+    Inserts a block that is not yet cached into a cache with associativity greater than 1,
+    evicting the least recently used block of the row if it is full
+    sig: list(list(CacheUnit)) -> int -> CacheUnit -> list(OrderedDict[int,int]) -> NoneType
+    """
+    if free_ways(cache,row,lru) > 0: #Space left in row so add to non-full row
+        insert_nonfull_assoc_cache(cache,row,unit,lru)
+    else: #Full row so we have to evict according to LRU and then add
+        insert_full_assoc_cache(cache,row,unit,lru)
+
+def update_lru(lru,row,tag):
+    """
+    Marks the block with the given tag as the most recently used block of its row
+    sig: list(OrderedDict[int,int]) -> int -> int -> NoneType
+    """
+    lru[row].move_to_end(tag)
@@ -0,0 +1,136 @@
+## Log sinks for the cache simulator.
+## A sink is called like print_log_entry for every cache event, and closed once the simulation ends.
+import struct
+import sys
+
+STATUS_CODES = {"HIT": 0, "MISS": 1, "SW": 2}
+STATUS_NAMES = {code: status for status, code in STATUS_CODES.items()}
+
+# Record of the binary log: level number, status code, pc, address and row
+LOG_RECORD = struct.Struct("<BBHHH")
+
+def finish_stream(stream,close_stream):
+    """
+    Flushes a stream a sink has written to, and closes it if the sink owns it
+    sig: file -> bool -> NoneType
+    """
+    if close_stream:
+        stream.close()
+    else:
+        stream.flush()
+
+class TextLogSink:
+    """
+    Writes the same lines as print_log_entry, but collects them and writes them in batches.
+    
+    Attributes:
+        stream (file): The text stream the log is written to.
+        lines (list(str)): The lines not written yet.
+        batch (int): The amount of lines collected before they are written.
+        close_stream (bool): If the stream is closed together with the sink.
+    """
+    def __init__(self,stream=None,batch=4096,close_stream=False):
+        self.stream = sys.stdout if stream is None else stream
+        self.lines = []
+        self.batch = batch
+        self.close_stream = close_stream
+
+    def __call__(self,cache_name,status,pc,addr,row):
+        self.lines.append("%-8s pc:%5d\taddr:%5d\trow:%4d\n" % (cache_name + " " + status,pc,addr,row))
+        if len(self.lines) >= self.batch:
+            self.flush()
+
+    def flush(self):
+        self.stream.write("".join(self.lines))
+        self.lines = []
+
+    def close(self):
+        self.flush()
+        finish_stream(self.stream,self.close_stream)
+
+class BinaryLogSink:
+    """
+    Writes every cache event as a fixed size LOG_RECORD, see read_binary_log.
+    
+    Attributes:
+        stream (file): The binary stream the log is written to.
+        records (bytearray): The records not written yet.
+        batch (int): The amount of bytes collected before they are written.
+        close_stream (bool): If the stream is closed together with the sink.
+    """
+    def __init__(self,stream,batch=65536,close_stream=False):
+        self.stream = stream
+        self.records = bytearray()
+        self.batch = batch
+        self.close_stream = close_stream
+
+    def __call__(self,cache_name,status,pc,addr,row):
+        self.records += LOG_RECORD.pack(int(cache_name[1:]),STATUS_CODES[status],pc,addr,row)
+        if len(self.records) >= self.batch:
+            self.flush()
+
+    def flush(self):
+        self.stream.write(self.records)
+        self.records = bytearray()
+
+    def close(self):
+        self.flush()
+        finish_stream(self.stream,self.close_stream)
+
+class CountingLogSink:
+    """
+    Only counts the cache events per cache and kind, and prints the counts when closed.
+    
+    Attributes:
+        stream (file): The text stream the counts are written to.
+        counts (dict[tuple[str,str],int]): The amount of events per (cache name, status).
+        close_stream (bool): If the stream is closed together with the sink.
+    """
+    def __init__(self,stream=None,close_stream=False):
+        self.stream = sys.stdout if stream is None else stream
+        self.counts = {}
+        self.close_stream = close_stream
+
+    def __call__(self,cache_name,status,pc,addr,row):
+        key = (cache_name,status)
+        self.counts[key] = self.counts.get(key,0) + 1
+
+    def flush(self):
+        pass
+
+    def close(self):
+        for (cache_name,status), count in sorted(self.counts.items()):
+            self.stream.write("%-8s %d\n" % (cache_name + " " + status,count))
+        finish_stream(self.stream,self.close_stream)
+
+def read_binary_log(data):
+    """
+    Decodes the bytes written by a BinaryLogSink.
+    Yields (cache_name, status, pc, addr, row) tuples, the arguments of print_log_entry
+    sig: bytes -> generator
+    """
+    for level, code, pc, addr, row in LOG_RECORD.iter_unpack(data):
+        yield "L%d" % level, STATUS_NAMES[code], pc, addr, row
+
+def make_log_sink(kind,filename=None):
+    """
+    Creates a log sink of the given kind: "text", "binary", "counts" or "none".
+    The log is written to the file with the given name, or to the standard output.
+    Returns None for "none", which makes the caches log nothing
+    sig: str -> str -> TextLogSink|BinaryLogSink|CountingLogSink
+    """
+    if kind == "none":
+        return None
+    if kind == "binary":
+        if filename is None:
+            return BinaryLogSink(sys.stdout.buffer)
+        return BinaryLogSink(open(filename,"wb"),close_stream=True)
+    if kind == "text":
+        if filename is None:
+            return TextLogSink()
+        return TextLogSink(open(filename,"w"),close_stream=True)
+    elif kind == "counts":
+        if filename is None:
+            return CountingLogSink()
+        return CountingLogSink(open(filename,"w"),close_stream=True)
+    raise ValueError("Unknown log kind: %s" % kind)
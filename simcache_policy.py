@@ -0,0 +1,173 @@
+## Replacement and write policies for the cache simulator.
+##
+## The blocks of a row are kept in an OrderedDict from tag to way, as for the LRU caches of
+## simcache_helpers. A replacement policy is told about every access to a block of a row
+## with touch, and chooses the tag to evict from a full row with victim.
+## get_state and set_state save and restore whatever else it remembers, for checkpoints.
+import random
+from collections import namedtuple
+
+# replacement: "lru", "fifo", "random" or "plru"
+# write_back: if a sw only marks the block dirty instead of writing through to the next level
+# write_allocate: if a sw of a block that is not cached brings it into the cache
+# seed: the seed of the random replacement
+CachePolicy = namedtuple("CachePolicy", ["replacement","write_back","write_allocate","seed"])
+DEFAULT_POLICY = CachePolicy("lru",False,True,0)
+
+class LRUReplacement:
+    """
+    Evicts the least recently used block of the row.
+    """
+    def touch(self,row,ways,tag):
+        ways.move_to_end(tag)
+
+    def victim(self,row,ways):
+        return next(iter(ways))
+
+    def get_state(self):
+        return None
+
+    def set_state(self,state):
+        pass
+
+class FIFOReplacement:
+    """
+    Evicts the block that was brought into the row first, accesses do not change the order.
+    """
+    def touch(self,row,ways,tag):
+        pass
+
+    def victim(self,row,ways):
+        return next(iter(ways))
+
+    def get_state(self):
+        return None
+
+    def set_state(self,state):
+        pass
+
+class RandomReplacement:
+    """
+    Evicts a random block of the row.
+
+    Attributes:
+        rng (Random): The seeded random generator, so runs can be repeated.
+    """
+    def __init__(self,seed=0):
+        self.rng = random.Random(seed)
+
+    def touch(self,row,ways,tag):
+        pass
+
+    def victim(self,row,ways):
+        return list(ways)[self.rng.randrange(len(ways))]
+
+    def get_state(self):
+        version, internal, gauss = self.rng.getstate()
+        return [version,list(internal),gauss]
+
+    def set_state(self,state):
+        version, internal, gauss = state
+        self.rng.setstate((version,tuple(internal),gauss))
+
+class PLRUReplacement:
+    """
+    Tree pseudo-LRU: every row has a binary tree of assoc - 1 bits over its ways. An access
+    points the bits on the path to its way away from it, and the victim is found by following them.
+
+    Attributes:
+        levels (int): The depth of the tree, log2 of the associativity.
+        trees (list(list(int))): The bits of every row, node i has the children 2i+1 and 2i+2.
+    """
+    def __init__(self,rows,assoc):
+        if assoc & (assoc - 1) != 0:
+            raise Exception("Tree PLRU needs a power of two associativity")
+        self.levels = assoc.bit_length() - 1
+        self.trees = [[0] * (assoc - 1) for _ in range(rows)]
+
+    def touch(self,row,ways,tag):
+        tree = self.trees[row]
+        way = ways[tag]
+        node = 0
+        for level in range(self.levels - 1,-1,-1):
+            bit = (way >> level) & 1
+            tree[node] = 1 - bit
+            node = 2 * node + 1 + bit
+
+    def victim(self,row,ways):
+        tree = self.trees[row]
+        way = 0
+        node = 0
+        for _ in range(self.levels):
+            bit = tree[node]
+            way = 2 * way + bit
+            node = 2 * node + 1 + bit
+        for tag, tag_way in ways.items():
+            if tag_way == way:
+                return tag
+
+    def get_state(self):
+        return self.trees
+
+    def set_state(self,state):
+        self.trees = [list(tree) for tree in state]
+
+def make_replacement(policy,rows,assoc):
+    """
+    Creates the replacement policy named by policy.replacement for a cache of the given shape
+    sig: CachePolicy -> int -> int -> LRUReplacement|FIFOReplacement|RandomReplacement|PLRUReplacement
+    """
+    if policy.replacement == "lru":
+        return LRUReplacement()
+    if policy.replacement == "fifo":
+        return FIFOReplacement()
+    if policy.replacement == "random":
+        return RandomReplacement(policy.seed)
+    if policy.replacement == "plru":
+        return PLRUReplacement(rows,assoc)
+    raise Exception("Unknown replacement policy: %s" % policy.replacement)
+
+def add_policy_arguments(parser):
+    """
+    Adds the command line options choosing the cache policies to an ArgumentParser
+    sig: ArgumentParser -> NoneType
+    """
+    parser.add_argument('--replacement', choices=['lru','fifo','random','plru'], help=
+        'The replacement policy of the caches, plru is tree pseudo-LRU. Defaults to lru')
+    parser.add_argument('--seed', type=int, help=
+        'The seed of the random replacement policy, 0 by default')
+    parser.add_argument('--write', choices=['through','back'], help=
+        'Write-through (the default) passes every sw on to the next level, write-back marks the block dirty '
+        'and writes it back when it is evicted')
+    parser.add_argument('--write-miss', choices=['allocate','no-allocate'], help=
+        'If a sw of a block that is not cached brings it into the cache, allocate by default')
+    parser.add_argument('--inclusion', choices=['non-inclusive','inclusive','exclusive'], help=
+        'If the blocks of a level are also kept in the levels below it (inclusive), '
+        'only in one level (exclusive), or either (non-inclusive, the default)')
+
+POLICY_OPTIONS = ["replacement","seed","write","write_miss","inclusion"]
+
+def policy_from_args(cmdline):
+    """
+    Returns the CachePolicy chosen by the options of add_policy_arguments,
+    with the fields of DEFAULT_POLICY for the options that were not given
+    sig: Namespace -> CachePolicy
+    """
+    return CachePolicy(cmdline.replacement or DEFAULT_POLICY.replacement,
+                       cmdline.write == "back",
+                       cmdline.write_miss != "no-allocate",
+                       DEFAULT_POLICY.seed if cmdline.seed is None else cmdline.seed)
+
+def inclusion_from_args(cmdline):
+    """
+    Returns the inclusion policy chosen by --inclusion, non-inclusive if it was not given
+    sig: Namespace -> str
+    """
+    return cmdline.inclusion or "non-inclusive"
+
+def given_policy_options(cmdline):
+    """
+    Returns the command line names of the options of add_policy_arguments that were given
+    sig: Namespace -> list(str)
+    """
+    return ["--" + name.replace("_","-") for name in POLICY_OPTIONS if getattr(cmdline,name) is not None]
@@ -0,0 +1,143 @@
+## Sampled cache simulation, for programs too long to simulate every access of.
+##
+## The run is split into periods of SamplePlan.period instructions. Most of a period is executed
+## by the fast engine without caches, and only its last warmup + measure instructions pass their
+## lw and sw through the caches. The caches keep their contents between periods, and the warm-up
+## instructions bring the current working set back into them before the last measure instructions
+## are counted. Every measurement window is one sample, and the miss ratio and misses of the whole
+## run are estimated from the samples together with a confidence interval.
+import math
+from collections import namedtuple
+from statistics import NormalDist
+
+# period: the amount of instructions from the start of one measurement window to the next
+# warmup: the amount of instructions passed through the caches before every window without being counted
+# measure: the amount of instructions counted in every window
+SamplePlan = namedtuple("SamplePlan", ["period","warmup","measure"])
+DEFAULT_PLAN = SamplePlan(10000,1000,1000)
+
+# instructions: the amount of instructions in the window
+# counts: the amount of cache events in the window per (cache name, status)
+Sample = namedtuple("Sample", ["instructions","counts"])
+
+class SampleCounter:
+    """
+    Log sink that counts the cache events of one measurement window per cache and kind.
+
+    Attributes:
+        counts (dict[tuple[str,str],int]): The amount of events per (cache name, status).
+    """
+    def __init__(self):
+        self.counts = {}
+
+    def __call__(self,cache_name,status,pc,addr,row):
+        key = (cache_name,status)
+        self.counts[key] = self.counts.get(key,0) + 1
+
+    def take(self):
+        """
+        Returns the counts of the window and starts a new one
+        sig: NoneType -> dict[tuple[str,str],int]
+        """
+        counts = self.counts
+        self.counts = {}
+        return counts
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+def check_plan(plan):
+    """
+    Checks that the windows of the plan fit in its period
+    sig: SamplePlan -> NoneType
+    """
+    if plan.measure <= 0 or plan.warmup < 0 or plan.warmup + plan.measure > plan.period:
+        raise Exception("Invalid sampling plan: the warm-up and measurement windows must fit in the period")
+
+def ratio_estimate(numerators,denominators,z):
+    """
+    Estimates sum(numerators) / sum(denominators) over the whole population from the samples,
+    and the half width of its confidence interval with the normal quantile z
+    sig: list(int) -> list(int) -> float -> tuple[float, float]
+    """
+    total = sum(denominators)
+    if total == 0:
+        return 0.0, 0.0
+    ratio = sum(numerators) / total
+    n = len(denominators)
+    if n < 2:
+        return ratio, math.inf
+    residuals = [num - ratio * den for num, den in zip(numerators,denominators)]
+    variance = sum(r * r for r in residuals) / (n - 1)
+    mean = total / n
+    return ratio, z * math.sqrt(variance / n) / mean
+
+def estimate(samples,names,instructions,confidence=0.95):
+    """
+    Estimates the miss ratio of the lw of every cache level and its misses over all instructions
+    executed, given the samples of the measurement windows
+    sig: list(Sample) -> list(str) -> int -> float -> list(dict)
+    """
+    z = NormalDist().inv_cdf((1 + confidence) / 2)
+    sizes = [sample.instructions for sample in samples]
+    estimates = []
+    for name in names:
+        hits = [sample.counts.get((name,"HIT"),0) for sample in samples]
+        misses = [sample.counts.get((name,"MISS"),0) for sample in samples]
+        reads = [hit + miss for hit, miss in zip(hits,misses)]
+        ratio, ratio_error = ratio_estimate(misses,reads,z)
+        per_instr, per_instr_error = ratio_estimate(misses,sizes,z)
+        reads_per_instr, _ = ratio_estimate(reads,sizes,z)
+        estimates.append({"name": name, "samples": len(samples), "measured_reads": sum(reads),
+                          "miss_ratio": ratio, "miss_ratio_error": ratio_error,
+                          "reads": reads_per_instr * instructions,
+                          "misses": per_instr * instructions, "misses_error": per_instr_error * instructions})
+    return estimates
+
+def sample_report(estimates,instructions,measured,confidence=0.95):
+    """
+    Returns the lines of the summary of a sampled run
+    sig: list(dict) -> int -> int -> float -> list(str)
+    """
+    lines = ["instructions %d, measured %d (%.2f%%)" % (instructions,measured,100 * measured / instructions if instructions else 0.0)]
+    for est in estimates:
+        lines.append("%s samples %d, measured reads %d" % (est["name"],est["samples"],est["measured_reads"]))
+        lines.append("  miss ratio %.4f +- %.4f (%g%% confidence)" % (est["miss_ratio"],est["miss_ratio_error"],100 * confidence))
+        lines.append("  reads      %.0f" % est["reads"])
+        lines.append("  misses     %.0f +- %.0f" % (est["misses"],est["misses_error"]))
+    return lines
+
+def add_sample_arguments(parser):
+    """
+    Adds the command line options of sampled simulation to an ArgumentParser
+    sig: ArgumentParser -> NoneType
+    """
+    parser.add_argument('--sample', action='store_true', help=
+        'Only simulate the caches in short windows spread over the run, and estimate the miss ratio '
+        'and misses of every cache from them instead of logging every event')
+    parser.add_argument('--period', type=int, default=DEFAULT_PLAN.period, help=
+        'The amount of instructions from the start of one measurement window to the next')
+    parser.add_argument('--warmup', type=int, default=DEFAULT_PLAN.warmup, help=
+        'The amount of instructions simulated on the caches before every window without being counted')
+    parser.add_argument('--measure', type=int, default=DEFAULT_PLAN.measure, help=
+        'The amount of instructions counted in every window')
+    parser.add_argument('--confidence', type=float, default=0.95, help=
+        'The confidence level of the intervals of the estimates')
+
+def plan_from_args(parser,cmdline):
+    """
+    Returns the SamplePlan chosen by the options of add_sample_arguments, or None without --sample.
+    Reports an error through the parser if its windows do not fit in its period
+    sig: ArgumentParser -> Namespace -> SamplePlan
+    """
+    if not cmdline.sample:
+        return None
+    plan = SamplePlan(cmdline.period,cmdline.warmup,cmdline.measure)
+    try:
+        check_plan(plan)
+    except Exception as error:
+        parser.error(str(error))
+    return plan
@@ -0,0 +1,126 @@
+#!/usr/bin/python3
+## Stack distance analysis of the lw/sw accesses of a program.
+##
+## With LRU replacement, a lw hits a cache with a given number of rows exactly when fewer than
+## assoc distinct blocks of its row were accessed since the previous access to its block.
+## One pass over the trace gives this distance for every lw, and with it the amount of
+## misses for every associativity, and so every cache size, of that row count at once.
+
+import argparse
+from sim_main import *
+from simcache_trace import *
+from simcache_sweep import record_trace, int_list
+
+class FenwickTree:
+    """
+    Binary indexed tree of counts, giving sums over prefixes of positions in logarithmic time.
+
+    Attributes:
+        tree (list(int)): The partial sums, tree[i] holds the sum of the positions i-(i&-i)+1 up to i.
+    """
+    def __init__(self,size):
+        self.tree = [0] * (size + 1)
+
+    def add(self,position,amount):
+        """
+        Adds amount to the count at position
+        sig: int -> int -> NoneType
+        """
+        tree = self.tree
+        i = position + 1
+        while i < len(tree):
+            tree[i] += amount
+            i += i & -i
+
+    def prefix(self,position):
+        """
+        Returns the sum of the counts at the positions before position
+        sig: int -> int
+        """
+        tree = self.tree
+        total = 0
+        i = position
+        while i > 0:
+            total += tree[i]
+            i -= i & -i
+        return total
+
+def stack_distances(trace,blocksize,rows=1):
+    """
+    Computes the stack distance of every lw of the trace in a cache with the given blocksize
+    and amount of rows: the amount of distinct blocks of its row accessed since the previous
+    access to its block. Every sw is an access as well, since it always allocates its block.
+    Returns a list where the element at index d is the amount of lw with distance d, and the
+    amount of lw of blocks that were never accessed before
+    sig: list(tuple[str,int,int]) -> int -> int -> tuple[list(int), int]
+    """
+    # Visit the accesses row by row, so the accesses in between two accesses are all of the same row
+    blockids = [addr // blocksize for _, _, addr in trace]
+    order = sorted(range(len(trace)),key=lambda i: blockids[i] % rows)
+
+    marks = FenwickTree(len(trace)) #Marks the position of the last access to every block
+    last = {}
+    histogram = []
+    cold = 0
+    for position, i in enumerate(order):
+        blockid = blockids[i]
+        previous = last.get(blockid)
+        if previous is not None:
+            marks.add(previous,-1)
+        if trace[i][0] == "lw":
+            if previous is None:
+                cold += 1
+            else:
+                distance = marks.prefix(position) - marks.prefix(previous + 1)
+                while len(histogram) <= distance:
+                    histogram.append(0)
+                histogram[distance] += 1
+        marks.add(position,1)
+        last[blockid] = position
+    return histogram, cold
+
+def miss_curve(histogram,cold):
+    """
+    Returns the amount of lw misses for every associativity from 1 up to the largest that
+    still makes a difference, at index assoc - 1. A lw hits when its distance is below assoc
+    sig: list(int) -> int -> list(int)
+    """
+    misses = []
+    remaining = cold + sum(histogram)
+    for count in histogram:
+        remaining -= count
+        misses.append(remaining)
+    return misses or [cold]
+
+def main():
+    parser = argparse.ArgumentParser(description='Miss counts of every LRU cache size from one E20 program execution')
+    parser.add_argument('filename', help=
+        'The file containing machine code, typically with .bin suffix, or a trace recorded by simcache.py --record-trace')
+    parser.add_argument('--blocksizes', type=int_list, default=[1,2,4,8,16,32,64], help=
+        'Comma separated blocksizes')
+    parser.add_argument('--rows', type=int_list, default=[1], help=
+        'Comma separated amounts of rows, the default 1 gives fully associative caches')
+    parser.add_argument('--all', action='store_true', help=
+        'Print every associativity instead of only the powers of two')
+    add_image_arguments(parser)
+    cmdline = parser.parse_args()
+
+    if is_trace_file(cmdline.filename):
+        trace = list(read_trace(cmdline.filename))
+    else:
+        mem_array = new_mem_array(constants.MEM_SIZE)
+        load_program(cmdline.filename,mem_array,cmdline.use_image)
+        trace = record_trace(mem_array)
+    loads = sum(1 for op, _, _ in trace if op == "lw")
+
+    print("%-9s %5s %5s %9s %9s %10s" % ("size","rows","assoc","blocksize","misses","miss ratio"))
+    for blocksize in cmdline.blocksizes:
+        for rows in cmdline.rows:
+            misses = miss_curve(*stack_distances(trace,blocksize,rows))
+            for assoc in range(1,len(misses) + 1):
+                if cmdline.all or assoc & (assoc - 1) == 0 or assoc == len(misses):
+                    ratio = misses[assoc - 1] / loads if loads else 0.0
+                    print("%-9d %5d %5d %9d %9d %10.4f" % (rows * assoc * blocksize,rows,assoc,blocksize,misses[assoc - 1],ratio))
+
+if __name__ == "__main__":
+    main()
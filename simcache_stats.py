@@ -0,0 +1,138 @@
+## Statistics of the cache simulator: counts per cache level and the misses per pc and memory region.
+import json
+import sys
+from collections import OrderedDict
+
+REGION_SIZE = 128
+
+class CacheStats:
+    """
+    Counts the accesses of one cache level, classifies its lw misses and attributes them
+    to the pc of the lw and the region of memory it reads.
+    A miss is compulsory the first time a block is accessed, a capacity miss if a fully
+    associative LRU cache of the same size would have missed as well, and a conflict miss otherwise.
+
+    Attributes:
+        name (str): The name of the cache, "L1" or "L2".
+        reads (int): The amount of lw that reached the cache.
+        writes (int): The amount of sw that reached the cache.
+        hits (int): The amount of lw hits.
+        misses (int): The amount of lw misses.
+        evictions (int): The amount of blocks removed from the cache to make room for another.
+        writebacks (int): The amount of dirty blocks written back to the next level or memory.
+        compulsory (int): The amount of compulsory misses.
+        capacity (int): The amount of capacity misses.
+        conflict (int): The amount of conflict misses.
+        pc_misses (dict[int,int]): The amount of misses per pc.
+        region_misses (dict[int,int]): The amount of misses per region, by the first address of the region.
+        region_size (int): The amount of memory cells per region.
+        seen (set(int)): The blocks accessed so far.
+        shadow (OrderedDict[int,NoneType]): The blocks of a fully associative LRU cache of the same size.
+        shadow_blocks (int): The amount of blocks the fully associative cache holds.
+    """
+    def __init__(self,name,size,blocksize,region_size=REGION_SIZE):
+        self.name = name
+        self.reads = 0
+        self.writes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.writebacks = 0
+        self.compulsory = 0
+        self.capacity = 0
+        self.conflict = 0
+        self.pc_misses = {}
+        self.region_misses = {}
+        self.region_size = region_size
+        self.seen = set()
+        self.shadow = OrderedDict()
+        self.shadow_blocks = size // blocksize
+
+    def touch(self,blockid):
+        """
+        Accesses the block in the fully associative cache. Returns if it was there
+        sig: int -> bool
+        """
+        shadow = self.shadow
+        if blockid in shadow:
+            shadow.move_to_end(blockid)
+            return True
+        if len(shadow) == self.shadow_blocks:
+            shadow.popitem(last=False)
+        shadow[blockid] = None
+        return False
+
+    def record_lw(self,pc,addr,blockid,hit,evicts):
+        """
+        Counts a lw of addr by the instruction at pc, given if it hit and if it evicted a block
+        sig: int -> int -> int -> bool -> bool -> NoneType
+        """
+        self.reads += 1
+        shadow_hit = self.touch(blockid)
+        if hit:
+            self.hits += 1
+        else:
+            self.misses += 1
+            if blockid not in self.seen:
+                self.compulsory += 1
+            elif shadow_hit:
+                self.conflict += 1
+            else:
+                self.capacity += 1
+            self.pc_misses[pc] = self.pc_misses.get(pc,0) + 1
+            region = addr - addr % self.region_size
+            self.region_misses[region] = self.region_misses.get(region,0) + 1
+        self.evictions += evicts
+        self.seen.add(blockid)
+
+    def record_sw(self,blockid,evicts):
+        """
+        Counts a sw, given if it evicted a block
+        sig: int -> bool -> NoneType
+        """
+        self.writes += 1
+        self.touch(blockid)
+        self.evictions += evicts
+        self.seen.add(blockid)
+
+    def as_dict(self):
+        """
+        Returns the statistics as a dict that can be written as JSON
+        sig: NoneType -> dict
+        """
+        return {"reads": self.reads, "writes": self.writes, "hits": self.hits, "misses": self.misses,
+                "evictions": self.evictions, "writebacks": self.writebacks,
+                "compulsory": self.compulsory, "capacity": self.capacity,
+                "conflict": self.conflict, "region_size": self.region_size,
+                "pc_misses": {str(pc): count for pc, count in sorted(self.pc_misses.items())},
+                "region_misses": {str(region): count for region, count in sorted(self.region_misses.items())}}
+
+def stats_table(stats):
+    """
+    Returns the lines of a readable summary of the statistics, the pcs and regions with most misses first
+    sig: CacheStats -> list(str)
+    """
+    ratio = stats.misses / stats.reads if stats.reads else 0.0
+    lines = ["%s statistics" % stats.name]
+    for field in ("reads","writes","hits","misses","evictions","writebacks","compulsory","capacity","conflict"):
+        lines.append("  %-10s %d" % (field,getattr(stats,field)))
+    lines.append("  %-10s %.4f" % ("miss ratio",ratio))
+    lines.append("%s misses by pc" % stats.name)
+    for pc, count in sorted(stats.pc_misses.items(),key=lambda item: (-item[1],item[0])):
+        lines.append("  pc:%5d\tmisses:%d" % (pc,count))
+    lines.append("%s misses by region" % stats.name)
+    for region, count in sorted(stats.region_misses.items(),key=lambda item: (-item[1],item[0])):
+        lines.append("  addr:%5d-%5d\tmisses:%d" % (region,region + stats.region_size - 1,count))
+    return lines
+
+def print_stats(all_stats,kind="table",stream=None):
+    """
+    Prints the statistics of every cache level as a table or, for kind "json", a JSON object by cache name
+    sig: list(CacheStats) -> str -> file -> NoneType
+    """
+    stream = sys.stdout if stream is None else stream
+    if kind == "json":
+        stream.write(json.dumps({stats.name: stats.as_dict() for stats in all_stats}) + "\n")
+    else:
+        for stats in all_stats:
+            stream.write("\n".join(stats_table(stats)) + "\n")
@@ -0,0 +1,118 @@
+#!/usr/bin/python3
+## Simulates many cache configurations from a single execution of a program.
+## The lw/sw accesses are recorded once and then replayed through every configuration.
+
+import argparse
+from sim_main import *
+from simcache import *
+
+def record_trace(mem_array,max_steps=None):
+    """
+    Runs the program loaded into mem_array once and records every lw and sw it executes.
+    Returns the accesses as (op, pc, addr) tuples in execution order, where op is "lw" or "sw"
+    sig: array(int) -> int -> list(tuple[str,int,int])
+    """
+    trace = []
+    machine = Machine(mem_array)
+    machine.mem_hook = lambda instr, pc, addr: trace.append((instr.name,pc,addr))
+    machine.run(max_steps)
+    return trace
+
+def valid_config(size,assoc,blocksize):
+    """
+    Checks if the cache configuration results in a whole, non-zero number of rows
+    sig: int -> int -> int -> bool
+    """
+    return size >= assoc*blocksize and size % (assoc*blocksize) == 0
+
+def replay_level(trace,size,assoc,blocksize,name="L1"):
+    """
+    Replays the accesses of a trace through a single cache level without logging.
+    Returns the amount of lw hits and misses, and the accesses that are passed on 
+    to the next level: every sw and every lw that missed
+    sig: list(tuple[str,int,int]) -> int -> int -> int -> str -> tuple[int, int, list(tuple[str,int,int])]
+    """
+    level = CacheLevel(name,size,assoc,blocksize,log=None)
+    hits = 0
+    misses = 0
+    passed_on = []
+    for access in trace:
+        op, pc, addr = access
+        if op == "lw":
+            if level.lw(pc,addr) == "HIT":
+                hits += 1
+            else:
+                misses += 1
+                passed_on.append(access)
+        else:
+            level.sw(pc,addr)
+            passed_on.append(access)
+    return hits, misses, passed_on
+
+def sweep(trace,L1configs,L2configs=()):
+    """
+    Replays the trace through every L1 configuration alone and through every L1/L2 pair.
+    Every L1 configuration is only replayed once, the L2 configurations replay what it passed on.
+    Yields (L1config, L2config, L1hits, L1misses, L2hits, L2misses) tuples, 
+    where L2config, L2hits and L2misses are None for L1 alone
+    sig: list(tuple[str,int,int]) -> list(tuple[int,int,int]) -> list(tuple[int,int,int]) -> generator
+    """
+    for L1config in L1configs:
+        L1hits, L1misses, passed_on = replay_level(trace,*L1config)
+        yield L1config, None, L1hits, L1misses, None, None
+        for L2config in L2configs:
+            L2hits, L2misses, _ = replay_level(passed_on,*L2config,name="L2")
+            yield L1config, L2config, L1hits, L1misses, L2hits, L2misses
+
+def config_grid(sizes,assocs,blocksizes):
+    """
+    Returns every valid (size, assoc, blocksize) combination of the given values
+    sig: list(int) -> list(int) -> list(int) -> list(tuple[int,int,int])
+    """
+    return [(size,assoc,blocksize) for size in sizes for assoc in assocs for blocksize in blocksizes
+            if valid_config(size,assoc,blocksize)]
+
+def int_list(text):
+    return [int(x) for x in text.split(",")]
+
+def main():
+    parser = argparse.ArgumentParser(description='Sweep E20 cache configurations over one program execution')
+    parser.add_argument('filename', help=
+        'The file containing machine code, typically with .bin suffix, or a trace recorded by simcache.py --record-trace')
+    parser.add_argument('--sizes', type=int_list, default=[16,32,64,128,256], help=
+        'Comma separated L1 sizes')
+    parser.add_argument('--assocs', type=int_list, default=[1,2,4,8,16], help=
+        'Comma separated L1 associativities')
+    parser.add_argument('--blocksizes', type=int_list, default=[1,2,4,8,16,32,64], help=
+        'Comma separated L1 blocksizes')
+    parser.add_argument('--l2-sizes', type=int_list, help=
+        'Comma separated L2 sizes, giving any of the L2 options also sweeps L1/L2 pairs')
+    parser.add_argument('--l2-assocs', type=int_list, help=
+        'Comma separated L2 associativities, defaults to the L1 ones')
+    parser.add_argument('--l2-blocksizes', type=int_list, help=
+        'Comma separated L2 blocksizes, defaults to the L1 ones')
+    add_image_arguments(parser)
+    cmdline = parser.parse_args()
+
+    L1configs = config_grid(cmdline.sizes,cmdline.assocs,cmdline.blocksizes)
+    L2configs = []
+    if cmdline.l2_sizes or cmdline.l2_assocs or cmdline.l2_blocksizes:
+        L2configs = config_grid(cmdline.l2_sizes or cmdline.sizes,
+                                cmdline.l2_assocs or cmdline.assocs,
+                                cmdline.l2_blocksizes or cmdline.blocksizes)
+
+    if is_trace_file(cmdline.filename):
+        trace = list(read_trace(cmdline.filename))
+    else:
+        mem_array = new_mem_array(constants.MEM_SIZE)
+        load_program(cmdline.filename,mem_array,cmdline.use_image)
+        trace = record_trace(mem_array)
+    print("%-14s %-14s %9s %9s %9s %9s" % ("L1","L2","L1 hits","L1 misses","L2 hits","L2 misses"))
+    for L1config, L2config, L1hits, L1misses, L2hits, L2misses in sweep(trace,L1configs,L2configs):
+        L2name = "-" if L2config is None else "%d,%d,%d" % L2config
+        L2hits = "-" if L2hits is None else L2hits
+        L2misses = "-" if L2misses is None else L2misses
+        print("%-14s %-14s %9d %9d %9s %9s" % ("%d,%d,%d" % L1config,L2name,L1hits,L1misses,L2hits,L2misses))
+
+if __name__ == "__main__":
+    main()
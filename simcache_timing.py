@@ -0,0 +1,146 @@
+## Cycle timing model of the cache simulator.
+##
+## Every instruction costs the base latency of its opcode. A lw also costs the hit latency of
+## every cache level it looks up, and the memory latency if the last level missed as well.
+## A sw costs the hit latency of L1 only, since stores are buffered on their way down.
+## Without caches a lw costs the memory latency and a sw is buffered.
+## The model is a log sink, so it sees the same HIT/MISS/SW events the log does.
+import argparse
+
+DEFAULT_LATENCIES = {"add": 1, "sub": 1, "or": 1, "and": 1, "slt": 1, "jr": 1, "addi": 1, "slti": 1,
+                     "lw": 1, "sw": 1, "jeq": 1, "j": 1, "jal": 1, "undefined": 1}
+DEFAULT_HIT_LATENCIES = [1,10,30]
+DEFAULT_MEMORY_LATENCY = 100
+
+class TimingModel:
+    """
+    Counts the cycles of a program run on the cache simulator.
+    It is used as the step_hook of the Machine and as the log sink of the caches,
+    passing every cache event on to the log it wraps.
+
+    Attributes:
+        latencies (dict[str,int]): The base latency of every instruction name.
+        hit_latencies (list(int)): The latency of looking up a block in every level, L1 first.
+            Levels past the end of the list have the latency of the last level in it.
+        memory_latency (int): The latency of reading memory after the last level missed.
+        levels (int): The amount of cache levels, 0 if memory is accessed directly.
+        log (function): The log sink the cache events are passed on to, or None.
+        instructions (int): The amount of instructions executed.
+        cycles (int): The total amount of cycles.
+        accesses (int): The amount of lw and sw.
+        memory_cycles (int): The cycles spent on lw and sw past their base latency.
+    """
+    def __init__(self,latencies=None,hit_latencies=None,memory_latency=DEFAULT_MEMORY_LATENCY,levels=0,log=None):
+        self.latencies = dict(DEFAULT_LATENCIES)
+        if latencies is not None:
+            self.latencies.update(latencies)
+        self.hit_latencies = list(DEFAULT_HIT_LATENCIES if hit_latencies is None else hit_latencies)
+        self.memory_latency = memory_latency
+        self.levels = levels
+        self.log = log
+        self.instructions = 0
+        self.cycles = 0
+        self.accesses = 0
+        self.memory_cycles = 0
+
+    def hit_latency(self,number):
+        """
+        Returns the hit latency of the cache level with the given number, 1 for L1
+        sig: int -> int
+        """
+        return self.hit_latencies[min(number,len(self.hit_latencies)) - 1]
+
+    def add_memory_cycles(self,cycles):
+        self.memory_cycles += cycles
+        self.cycles += cycles
+
+    def step(self,instr,pc,next_pc):
+        """
+        Counts an executed instruction, used as the step_hook of the Machine
+        sig: DecodedInstr -> int -> int -> NoneType
+        """
+        self.instructions += 1
+        self.cycles += self.latencies[instr.name]
+
+    def memory_access(self,instr,pc,addr):
+        """
+        Counts a lw or sw that goes directly to memory, used as the mem_hook of a Machine without caches
+        sig: DecodedInstr -> int -> int -> NoneType
+        """
+        self.accesses += 1
+        if instr.name == "lw":
+            self.add_memory_cycles(self.memory_latency)
+
+    def __call__(self,cache_name,status,pc,addr,row):
+        number = int(cache_name[1:])
+        if status == "SW":
+            if number == 1:
+                self.accesses += 1
+                self.add_memory_cycles(self.hit_latency(1))
+        else:
+            if number == 1:
+                self.accesses += 1
+            self.add_memory_cycles(self.hit_latency(number))
+            if status == "MISS" and number == self.levels:
+                self.add_memory_cycles(self.memory_latency)
+        if self.log is not None:
+            log = self.log
+            log(cache_name,status,pc,addr,row)
+
+    def flush(self):
+        if self.log is not None:
+            self.log.flush()
+
+    def close(self):
+        if self.log is not None:
+            self.log.close()
+
+    def report(self):
+        """
+        Returns the lines of the summary: instructions, cycles, cycles per instruction
+        and the average memory access time of the lw and sw
+        sig: NoneType -> list(str)
+        """
+        cpi = self.cycles / self.instructions if self.instructions else 0.0
+        amat = self.memory_cycles / self.accesses if self.accesses else 0.0
+        return ["instructions %d" % self.instructions,
+                "cycles       %d" % self.cycles,
+                "CPI          %.4f" % cpi,
+                "AMAT         %.4f" % amat]
+
+def latency_list(text):
+    """
+    Parses name=cycles pairs separated by commas, as given to --latencies
+    sig: str -> dict[str,int]
+    """
+    latencies = {}
+    for pair in text.split(","):
+        name, cycles = pair.split("=")
+        if name not in DEFAULT_LATENCIES:
+            raise argparse.ArgumentTypeError("Unknown instruction: %s" % name)
+        latencies[name] = int(cycles)
+    return latencies
+
+def add_timing_arguments(parser):
+    """
+    Adds the command line options of the timing model to an ArgumentParser
+    sig: ArgumentParser -> NoneType
+    """
+    parser.add_argument('--timing', action='store_true', help=
+        'Count the cycles of the program and print the cycles, CPI and average memory access time at the end')
+    parser.add_argument('--latencies', type=latency_list, help=
+        'Base latencies of instructions as comma separated name=cycles pairs, for example lw=2,jeq=2. '
+        'Every instruction takes 1 cycle by default')
+    parser.add_argument('--hit-latencies', type=lambda text: [int(x) for x in text.split(",")], help=
+        'Comma separated hit latencies of the cache levels, L1 first. Defaults to 1,10,30')
+    parser.add_argument('--memory-latency', type=int, default=DEFAULT_MEMORY_LATENCY, help=
+        'Latency of a lw that misses every cache level, or of every lw without caches')
+
+def timing_from_args(cmdline):
+    """
+    Returns the TimingModel chosen by the options of add_timing_arguments, or None without --timing
+    sig: Namespace -> TimingModel
+    """
+    if not cmdline.timing:
+        return None
+    return TimingModel(cmdline.latencies,cmdline.hit_latencies,cmdline.memory_latency)
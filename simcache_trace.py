@@ -0,0 +1,122 @@
+#!/usr/bin/python3
+## Recording of the memory accesses of a program to a trace file, and replay of trace files
+## through the cache model without running the program again.
+##
+## A trace file starts with the 8 byte TRACE_MAGIC, followed by one fixed size TRACE_RECORD
+## per lw or sw: the op code (0 for lw, 1 for sw), a padding byte, the pc and the address.
+## All records have the same size and alignment, so a trace can be used directly through mmap.
+
+import argparse
+import mmap
+import struct
+from sim_machine import *
+
+TRACE_MAGIC = b"E20TRC1\0"
+TRACE_RECORD = struct.Struct("<BxHH")
+TRACE_OPS = ("lw","sw")
+
+class TraceWriter:
+    """
+    Writes the accesses of a program to a trace file in batches.
+    
+    Attributes:
+        file (file): The binary file the trace is written to.
+        records (bytearray): The records not written yet.
+        batch (int): The amount of bytes collected before they are written.
+        count (int): The amount of records written so far.
+    """
+    def __init__(self,filename,batch=65536):
+        self.file = open(filename,"wb")
+        self.file.write(TRACE_MAGIC)
+        self.records = bytearray()
+        self.batch = batch
+        self.count = 0
+
+    def write(self,op,pc,addr):
+        """
+        Records one access. op is "lw" or "sw"
+        sig: str -> int -> int -> NoneType
+        """
+        self.records += TRACE_RECORD.pack(op == "sw",pc,addr)
+        self.count += 1
+        if len(self.records) >= self.batch:
+            self.flush()
+
+    def flush(self):
+        self.file.write(self.records)
+        self.records = bytearray()
+
+    def close(self):
+        self.flush()
+        self.file.close()
+
+def record_trace_file(mem_array,trace,max_steps=None):
+    """
+    Runs the program loaded into mem_array and records every lw and sw it executes with trace
+    sig: array(int) -> TraceWriter -> int -> Machine
+    """
+    machine = Machine(mem_array)
+    machine.mem_hook = lambda instr, pc, addr: trace.write(instr.name,pc,addr)
+    machine.run(max_steps)
+    return machine
+
+def is_trace_file(filename):
+    """
+    Checks if the file starts with TRACE_MAGIC
+    sig: str -> bool
+    """
+    with open(filename,"rb") as file:
+        return file.read(len(TRACE_MAGIC)) == TRACE_MAGIC
+
+def read_trace(filename):
+    """
+    Reads a trace file through mmap.
+    Yields the (op, pc, addr) tuples of the recorded accesses in order, where op is "lw" or "sw"
+    sig: str -> generator
+    """
+    with open(filename,"rb") as file:
+        if file.read(len(TRACE_MAGIC)) != TRACE_MAGIC:
+            raise ValueError("Not a trace file: %s" % filename)
+        size = file.seek(0,2)
+        if size == len(TRACE_MAGIC): #mmap can not map the empty record section
+            return
+        with mmap.mmap(file.fileno(),0,access=mmap.ACCESS_READ) as data:
+            records = memoryview(data)[len(TRACE_MAGIC):]
+            try:
+                for op, pc, addr in TRACE_RECORD.iter_unpack(records):
+                    yield TRACE_OPS[op], pc, addr
+            finally:
+                records.release()
+
+def main():
+    from simcache import make_cache_access, make_log_sink, print_stats, add_policy_arguments, policy_from_args, inclusion_from_args
+
+    parser = argparse.ArgumentParser(description='Replay a recorded E20 memory trace through the cache simulator')
+    parser.add_argument('filename', help=
+        'The trace file, as recorded by simcache.py --record-trace')
+    parser.add_argument('--cache', required=True, help=
+        'Cache configuration: size,associativity,blocksize for every level of cache, L1 first, '
+        'for example size,associativity,blocksize,size,associativity,blocksize for two caches')
+    parser.add_argument('--log', choices=['text','binary','counts','none'], default='text', help=
+        'How cache events are logged, as for simcache.py')
+    parser.add_argument('--log-file', help=
+        'The file the log is written to instead of the standard output')
+    parser.add_argument('--stats', choices=['table','json'], help=
+        'Print the statistics of every cache at the end, as for simcache.py')
+    add_policy_arguments(parser)
+    cmdline = parser.parse_args()
+
+    log = make_log_sink(cmdline.log,cmdline.log_file)
+    caches, cache_access = make_cache_access(cmdline.cache,log,cmdline.stats is not None,
+                                              policy_from_args(cmdline),inclusion_from_args(cmdline))
+    try:
+        for op, pc, addr in read_trace(cmdline.filename):
+            cache_access(op,pc,addr)
+    finally:
+        if log is not None:
+            log.close()
+    if cmdline.stats is not None:
+        print_stats([level.stats for level in caches],cmdline.stats)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,228 @@
+#!/usr/bin/python3
+## Vectorized cache simulation of whole memory traces with NumPy.
+##
+## Every lw and sw touches the cache the same way (a sw always allocates or refreshes its block),
+## so with LRU replacement an access hits exactly when fewer than assoc distinct tags of its row
+## were accessed since the previous access to the same block. The engine sorts the trace by row,
+## finds the previous access to every block and counts the distinct tags in between with a
+## merge sort tree, all with array operations. The results match simcache.py exactly.
+
+import argparse
+from sim_main import *
+from simcache import *
+from simcache_sweep import record_trace
+
+try:
+    import numpy as np
+except ImportError: #Only needed by this module, the rest of the simulator runs without it
+    np = None
+
+# Fields of a TRACE_RECORD, so a trace file can be used directly as an array
+TRACE_DTYPE = None if np is None else np.dtype([("op","u1"),("pad","u1"),("pc","<u2"),("addr","<u2")])
+
+def require_numpy():
+    if np is None:
+        raise ImportError("simcache_vector needs NumPy, install it with pip install numpy")
+
+def trace_arrays(trace):
+    """
+    Converts a list of (op, pc, addr) tuples, as returned by record_trace, to arrays.
+    Returns the ops (0 for lw, 1 for sw), pcs and addresses
+    sig: list(tuple[str,int,int]) -> tuple[ndarray, ndarray, ndarray]
+    """
+    require_numpy()
+    ops = np.array([op == "sw" for op, _, _ in trace],dtype=np.uint8)
+    pcs = np.array([pc for _, pc, _ in trace],dtype=np.int64)
+    addrs = np.array([addr for _, _, addr in trace],dtype=np.int64)
+    return ops, pcs, addrs
+
+def read_trace_arrays(filename):
+    """
+    Reads a trace file, as written by TraceWriter, directly into arrays.
+    Returns the ops (0 for lw, 1 for sw), pcs and addresses
+    sig: str -> tuple[ndarray, ndarray, ndarray]
+    """
+    require_numpy()
+    with open(filename,"rb") as file:
+        if file.read(len(TRACE_MAGIC)) != TRACE_MAGIC:
+            raise ValueError("Not a trace file: %s" % filename)
+        records = np.fromfile(file,dtype=TRACE_DTYPE)
+    return records["op"].copy(), records["pc"].astype(np.int64), records["addr"].astype(np.int64)
+
+def count_greater(values,lows,highs,limits):
+    """
+    Counts, for every query k, the positions j with lows[k] <= j < highs[k] and values[j] > limits[k].
+    The ranges are split into the nodes of a segment tree over the positions, every level
+    of which holds its nodes sorted, so each query needs one search per level
+    sig: ndarray -> ndarray -> ndarray -> ndarray -> ndarray
+    """
+    size = 1
+    while size < len(values):
+        size *= 2
+    padded = np.full(size,-1,dtype=np.int64)
+    padded[:len(values)] = values
+    spread = size + 2 #Separates the nodes of a level when they are searched together
+
+    counts = np.zeros(len(lows),dtype=np.int64)
+    left = lows.astype(np.int64) + size
+    right = highs.astype(np.int64) + size
+    width = 1
+    while True:
+        active = left < right
+        if not active.any():
+            break
+        padded = np.sort(padded.reshape(-1,width),axis=1,kind="stable").ravel() #Merges the two sorted halves of every node
+        level = padded + np.repeat(np.arange(size // width,dtype=np.int64) * spread,width)
+        first = size // width
+        for take_left in (True,False):
+            if take_left:
+                pick = active & (left & 1 == 1)
+                nodes = left[pick]
+                left[pick] += 1
+            else:
+                pick = active & (right & 1 == 1)
+                right[pick] -= 1
+                nodes = right[pick]
+            if len(nodes):
+                blocks = nodes - first
+                found = np.searchsorted(level,blocks * spread + limits[pick],side="right")
+                counts[pick] += (blocks + 1) * width - found
+        left >>= 1
+        right >>= 1
+        width *= 2
+    return counts
+
+def count_distinct(after,lows,highs,enough,scan=64):
+    """
+    Counts the distinct blocks accessed at the row sorted positions lows[k] <= j < highs[k],
+    which are the positions whose next access to the same block comes after highs[k].
+    Most windows are settled by looking back over their last scan accesses, counting stops
+    once enough blocks are found. The counts are exact below enough
+    sig: ndarray -> ndarray -> ndarray -> int -> int -> ndarray
+    """
+    counts = np.zeros(len(lows),dtype=np.int64)
+    pending = np.arange(len(lows))
+    for back in range(1,scan + 1):
+        positions = highs[pending] - back
+        inside = positions >= lows[pending]
+        pending = pending[inside]
+        counts[pending] += after[positions[inside]] > highs[pending]
+        pending = pending[counts[pending] < enough]
+        if not len(pending):
+            return counts
+    counts[pending] += count_greater(after,lows[pending],highs[pending] - scan,highs[pending])
+    return counts
+
+def simulate_level(ops,addrs,size,assoc,blocksize):
+    """
+    Simulates one LRU cache level over a whole trace.
+    Returns the status code (see STATUS_CODES) and the row of every access
+    sig: ndarray -> ndarray -> int -> int -> int -> tuple[ndarray, ndarray]
+    """
+    require_numpy()
+    rows = num_rows(size,assoc,blocksize)
+    blockids = addrs // blocksize
+    row = blockids % rows
+    amount = len(addrs)
+
+    # Position of every access once the trace is sorted by row, keeping the order within a row
+    by_row = np.argsort(row,kind="stable")
+    position = np.empty(amount,dtype=np.int64)
+    position[by_row] = np.arange(amount)
+
+    # Previous and next access to the same block, as positions in the row sorted order
+    by_block = np.lexsort((position,blockids))
+    same = blockids[by_block[1:]] == blockids[by_block[:-1]]
+    prev = np.full(amount,-1,dtype=np.int64)
+    prev[by_block[1:][same]] = position[by_block[:-1][same]]
+    after = np.full(amount,amount,dtype=np.int64)
+    after[position[by_block[:-1][same]]] = position[by_block[1:][same]]
+
+    # Accesses in between can hold at most as many distinct tags as there are accesses
+    between = position - prev - 1
+    hit = (prev >= 0) & (between < assoc)
+    unsure = np.nonzero((prev >= 0) & (between >= assoc) & (ops == 0))[0]
+    if len(unsure) and assoc > 1:
+        # A tag in between is distinct if this is its last access before the current one
+        distinct = count_distinct(after,prev[unsure] + 1,position[unsure],assoc)
+        hit[unsure] = distinct < assoc
+
+    status = np.where(hit,STATUS_CODES["HIT"],STATUS_CODES["MISS"]).astype(np.uint8)
+    status[ops == 1] = STATUS_CODES["SW"]
+    return status, row
+
+def simulate_hierarchy(ops,addrs,configs):
+    """
+    Simulates one or more cache levels over a whole trace. Like simcache.py, every sw goes to
+    every level and a lw only goes on to the next level if it missed.
+    Returns one (accesses, status, rows) tuple per level, where accesses are the indices
+    into the trace of the accesses that reached the level
+    sig: ndarray -> ndarray -> list(tuple[int,int,int]) -> list(tuple[ndarray, ndarray, ndarray])
+    """
+    require_numpy()
+    accesses = np.arange(len(addrs))
+    levels = []
+    for size, assoc, blocksize in configs:
+        status, rows = simulate_level(ops[accesses],addrs[accesses],size,assoc,blocksize)
+        levels.append((accesses,status,rows))
+        accesses = accesses[status != STATUS_CODES["HIT"]]
+    return levels
+
+def level_counts(levels):
+    """
+    Returns a dict with the amount of hits, misses and stores of every level
+    sig: list(tuple[ndarray, ndarray, ndarray]) -> dict[str,dict[str,int]]
+    """
+    counts = {}
+    for number, (_, status, _) in enumerate(levels):
+        found = np.bincount(status,minlength=len(STATUS_CODES))
+        counts["L%d" % (number + 1)] = {name: int(found[code]) for name, code in STATUS_CODES.items()}
+    return counts
+
+def log_levels(levels,pcs,addrs,log):
+    """
+    Passes the events of every level to log in the order simcache.py would log them
+    sig: list(tuple[ndarray, ndarray, ndarray]) -> ndarray -> ndarray -> function -> NoneType
+    """
+    accesses = np.concatenate([level[0] for level in levels])
+    numbers = np.concatenate([np.full(len(level[0]),number + 1) for number, level in enumerate(levels)])
+    status = np.concatenate([level[1] for level in levels])
+    rows = np.concatenate([level[2] for level in levels])
+    order = np.lexsort((numbers,accesses))
+    for access, number, code, row in zip(accesses[order].tolist(),numbers[order].tolist(),
+                                         status[order].tolist(),rows[order].tolist()):
+        log("L%d" % number,STATUS_NAMES[code],int(pcs[access]),int(addrs[access]),row)
+
+def main():
+    parser = argparse.ArgumentParser(description='Simulate E20 caches over a whole memory trace with NumPy')
+    parser.add_argument('filename', help=
+        'The file containing machine code, typically with .bin suffix, or a trace recorded by simcache.py --record-trace')
+    parser.add_argument('--cache', required=True, help=
+        'Cache configuration: size,associativity,blocksize for every level of cache, L1 first, '
+        'for example size,associativity,blocksize,size,associativity,blocksize for two caches')
+    parser.add_argument('--log', choices=['text','binary','counts','none'], default='text', help=
+        'How cache events are logged, as for simcache.py')
+    parser.add_argument('--log-file', help=
+        'The file the log is written to instead of the standard output')
+    add_image_arguments(parser)
+    cmdline = parser.parse_args()
+
+    if is_trace_file(cmdline.filename):
+        ops, pcs, addrs = read_trace_arrays(cmdline.filename)
+    else:
+        mem_array = new_mem_array(constants.MEM_SIZE)
+        load_program(cmdline.filename,mem_array,cmdline.use_image)
+        ops, pcs, addrs = trace_arrays(record_trace(mem_array))
+
+    configs = parse_cache_config(cmdline.cache)
+    for number, config in enumerate(configs):
+        print_cache_config("L%d" % (number + 1),*config,num_rows(*config))
+
+    levels = simulate_hierarchy(ops,addrs,configs)
+    log = make_log_sink(cmdline.log,cmdline.log_file)
+    if log is not None:
+        log_levels(levels,pcs,addrs,log)
+        log.close()
+
+if __name__ == "__main__":
+    main()